@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import config
+from utils.paths import cache_dir
+
+CACHE_FILE = "analysis.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    probe TEXT,
+    estimate INTEGER,
+    estimate_key TEXT,
+    seconds REAL,
+    crf INTEGER,
+    crf_key TEXT,
+    last_seen REAL NOT NULL
+)
+"""
+
+ADDED_COLUMNS = {"seconds": "REAL", "crf": "INTEGER", "crf_key": "TEXT"}
+
+class AnalysisCache:
+    def __init__(self, path=None, max_age_days=None):
+        self.path = str(path or cache_dir() / CACHE_FILE)
+        if max_age_days is None:
+            max_age_days = config.ANALYSIS_CACHE_MAX_AGE_DAYS
+        self.max_age = max_age_days * 86400
+        self._lock = threading.Lock()
+        self._now = time.time()
+        try:
+            self._conn = self._open()
+        except sqlite3.DatabaseError:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self._conn = self._open()
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(files)")}
+            for name, kind in ADDED_COLUMNS.items():
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE files ADD COLUMN {name} {kind}")
+            conn.commit()
+        except sqlite3.DatabaseError:
+            conn.close()
+            raise
+        return conn
+
+    def get(self, record):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime, probe, estimate, estimate_key, seconds FROM files WHERE path = ?",
+                (record.path,),
+            ).fetchone()
+            if row is None or row[0] != record.size or row[1] != record.mtime:
+                return None
+            self._conn.execute(
+                "UPDATE files SET last_seen = ? WHERE path = ?",
+                (self._now, record.path),
+            )
+        _, _, probe, estimate, estimate_key, seconds = row
+        return {
+            "probe": json.loads(probe) if probe else None,
+            "estimate": estimate,
+            "estimate_key": estimate_key,
+            "seconds": seconds,
+        }
+
+    def put(self, record, estimate=None, estimate_key=None, probe=None, seconds=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO files "
+                "(path, size, mtime, probe, estimate, estimate_key, seconds, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET "
+                "crf = CASE WHEN size = excluded.size AND mtime = excluded.mtime THEN crf END, "
+                "crf_key = CASE WHEN size = excluded.size AND mtime = excluded.mtime THEN crf_key END, "
+                "size = excluded.size, mtime = excluded.mtime, probe = excluded.probe, "
+                "estimate = excluded.estimate, estimate_key = excluded.estimate_key, "
+                "seconds = excluded.seconds, last_seen = excluded.last_seen",
+                (
+                    record.path,
+                    record.size,
+                    record.mtime,
+                    json.dumps(probe) if probe is not None else None,
+                    estimate,
+                    estimate_key,
+                    seconds,
+                    self._now,
+                ),
+            )
+
+    def put_probe(self, record, probe):
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE files SET probe = ?, last_seen = ? WHERE path = ? AND size = ? AND mtime = ?",
+                (json.dumps(probe), self._now, record.path, record.size, record.mtime),
+            )
+            if cur.rowcount:
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files "
+                "(path, size, mtime, probe, estimate, estimate_key, last_seen) "
+                "VALUES (?, ?, ?, ?, NULL, NULL, ?)",
+                (record.path, record.size, record.mtime, json.dumps(probe), self._now),
+            )
+
+    def get_crf(self, record, crf_key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT crf FROM files WHERE path = ? AND size = ? AND mtime = ? AND crf_key = ?",
+                (record.path, record.size, record.mtime, crf_key),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put_crf(self, record, crf_key, crf):
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE files SET crf = ?, crf_key = ?, last_seen = ? WHERE path = ? AND size = ? AND mtime = ?",
+                (crf, crf_key, self._now, record.path, record.size, record.mtime),
+            )
+            if cur.rowcount:
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime, crf, crf_key, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (record.path, record.size, record.mtime, crf, crf_key, self._now),
+            )
+
+    def evict(self):
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM files WHERE last_seen < ?",
+                (self._now - self.max_age,),
+            )
+            return cur.rowcount
+
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            try:
+                self._conn.commit()
+            finally:
+                self._conn.close()
@@ -0,0 +1,88 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz
+from PIL import Image
+
+from dispatcher import dispatch
+from process_backend import PROCESS_WORKERS, ProcessBackend
+
+def build_corpus(root, images, pdfs, texts, size):
+    rng = random.Random(0)
+    paths = []
+    for i in range(images):
+        path = os.path.join(root, f"img{i}.png")
+        img = Image.effect_noise((size, size), 40 + i % 30).convert("RGB")
+        img.save(path)
+        paths.append(path)
+    for i in range(pdfs):
+        path = os.path.join(root, f"doc{i}.pdf")
+        doc = fitz.open()
+        for page_number in range(10):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"Page {page_number} " + "lorem ipsum " * 200)
+        doc.save(path)
+        doc.close()
+        paths.append(path)
+    for i in range(texts):
+        path = os.path.join(root, f"text{i}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            for _ in range(50_000):
+                f.write("   " + " ".join(str(rng.random()) for _ in range(4)) + "   \n\n")
+        paths.append(path)
+    return paths
+
+def tasks_for(paths, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    return [
+        (path, os.path.join(output_dir, os.path.basename(path)), os.path.splitext(path)[1], False)
+        for path in paths
+    ]
+
+def measure(run, tasks, workers):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(run, tasks))
+    elapsed = time.perf_counter() - started
+    return sum(1 for result in results if result[2]), elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des backends threads / processus")
+    parser.add_argument("--images", type=int, default=24)
+    parser.add_argument("--pdfs", type=int, default=12)
+    parser.add_argument("--texts", type=int, default=12)
+    parser.add_argument("--size", type=int, default=1600, help="côté des images générées (pixels)")
+    parser.add_argument("--workers", type=int, default=PROCESS_WORKERS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="sc-bench-") as root:
+        source = os.path.join(root, "src")
+        os.makedirs(source)
+        paths = build_corpus(source, args.images, args.pdfs, args.texts, args.size)
+        total = sum(os.path.getsize(path) for path in paths)
+        print(f"corpus: {len(paths)} files, {total / 1024 / 1024:.1f} MB, workers={args.workers}")
+
+        ok, elapsed = measure(dispatch, tasks_for(paths, os.path.join(root, "thread")), args.workers)
+        print(f"thread   ok={ok}  time={elapsed:.2f}s  {len(paths) / elapsed:.1f} files/s")
+
+        started = time.perf_counter()
+        backend = ProcessBackend(args.workers)
+        startup = time.perf_counter() - started
+        try:
+            ok, elapsed = measure(backend.dispatch, tasks_for(paths, os.path.join(root, "process")), args.workers)
+        finally:
+            backend.close()
+        print(
+            f"process  ok={ok}  time={elapsed:.2f}s  {len(paths) / elapsed:.1f} files/s  "
+            f"startup={startup:.2f}s"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from compressors.video_compressor import benchmark_profile
+from probe import probe_path
+from setup_check import get_ffmpeg_paths
+
+def build_sample(path, seconds, height):
+    ffmpeg, _, env = get_ffmpeg_paths()
+    subprocess.run(
+        [
+            ffmpeg, "-y", "-hide_banner", "-loglevel", "error",
+            "-f", "lavfi", "-i", f"testsrc2=size={height * 16 // 9}x{height}:rate=30:duration={seconds}",
+            "-f", "lavfi", "-i", f"anoisesrc=duration={seconds}:amplitude=0.02",
+            "-c:v", "libx264", "-preset", "ultrafast", "-crf", "12", "-c:a", "aac",
+            path,
+        ],
+        check=True,
+        env=env,
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des profils d'encodage vidéo")
+    parser.add_argument("--input", help="vidéo à utiliser (par défaut : mire générée)")
+    parser.add_argument("--seconds", type=float, default=10, help="durée encodée par profil")
+    parser.add_argument("--height", type=int, default=1080, help="hauteur de la mire générée")
+    parser.add_argument("--profiles", nargs="*", default=list(config.ENCODER_PROFILES))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="sc-bench-") as root:
+        source = args.input
+        if not source:
+            source = os.path.join(root, "sample.mkv")
+            build_sample(source, args.seconds, args.height)
+        probe = probe_path(source)
+        video = (probe or {}).get("video") or {}
+        print(
+            f"source: {os.path.basename(source)} {video.get('width')}x{video.get('height')} "
+            f"@ {video.get('fps') or 0:.2f} fps, crf={config.VIDEO_CRF}"
+        )
+        for profile in args.profiles:
+            try:
+                result = benchmark_profile(source, profile, probe, clip=args.seconds)
+            except RuntimeError as e:
+                print(f"{profile:<14} error: {e}")
+                continue
+            if result is None:
+                print(f"{profile:<14} no encoder available")
+                continue
+            print(
+                f"{profile:<14} {result['codec']:<12} {result['fps']:7.1f} fps  "
+                f"{result['bytes_per_second'] * 8 / 1000:8.0f} kb/s  {result['seconds']:6.1f}s"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scanner
+
+EXTENSIONS = (".jpg", ".png", ".txt", ".pdf", ".mp4", ".doc")
+
+def build_tree(root, depth, fanout, files_per_dir):
+    count = 0
+    pending = [(root, 0)]
+    while pending:
+        folder, level = pending.pop()
+        os.makedirs(folder, exist_ok=True)
+        for i in range(files_per_dir):
+            ext = EXTENSIONS[i % len(EXTENSIONS)]
+            with open(os.path.join(folder, f"f{i}{ext}"), "wb") as f:
+                f.write(b"x" * (i + 1))
+            count += 1
+        if level < depth:
+            for i in range(fanout):
+                pending.append((os.path.join(folder, f"d{i}"), level + 1))
+    return count
+
+def with_latency(latency_ms):
+    real_scandir = os.scandir
+
+    def slow_scandir(path):
+        time.sleep(latency_ms / 1000.0)
+        return real_scandir(path)
+
+    scanner.os.scandir = slow_scandir
+    return real_scandir
+
+def measure(root, workers):
+    started = time.perf_counter()
+    first = None
+    found = 0
+    for _ in scanner.iter_folder(root, workers=workers):
+        if first is None:
+            first = time.perf_counter() - started
+        found += 1
+    elapsed = time.perf_counter() - started
+    return found, elapsed, first or 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du scanner de dossiers")
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--fanout", type=int, default=5)
+    parser.add_argument("--files", type=int, default=20, help="fichiers par dossier")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="latence simulée par listage de dossier")
+    parser.add_argument("--workers", type=int, nargs="*", default=[1, 4, scanner.SCAN_WORKERS])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="sc-bench-") as root:
+        created = build_tree(root, args.depth, args.fanout, args.files)
+        print(f"tree: {created} files, depth={args.depth}, fanout={args.fanout}, latency={args.latency_ms}ms")
+        if args.latency_ms:
+            with_latency(args.latency_ms)
+        for workers in sorted(set(args.workers)):
+            found, elapsed, first = measure(root, workers)
+            rate = found / elapsed if elapsed > 0 else 0.0
+            print(
+                f"workers={workers:>3}  found={found}  time={elapsed:.3f}s  "
+                f"first={first * 1000:.1f}ms  {rate:,.0f} files/s"
+            )
+
+if __name__ == "__main__":
+    main()
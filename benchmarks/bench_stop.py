@@ -0,0 +1,61 @@
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dispatcher import run
+from scanner import iter_folder
+from scheduler import CompressionControl
+
+def build_corpus(root, texts, text_mb, video, videos):
+    rng = random.Random(0)
+    line = "   " + " ".join(str(rng.random()) for _ in range(4)) + "   \n\n"
+    for i in range(texts):
+        with open(os.path.join(root, f"text{i}.txt"), "w", encoding="utf-8") as f:
+            for _ in range(text_mb * 1024 * 1024 // len(line)):
+                f.write(line)
+    if video:
+        ext = os.path.splitext(video)[1]
+        for i in range(videos):
+            shutil.copy2(video, os.path.join(root, f"video{i}{ext}"))
+
+def measure(source, output, after):
+    control = CompressionControl()
+    records = list(iter_folder(source))
+    runner = threading.Thread(target=run, args=(records, output, False, control))
+    runner.start()
+    time.sleep(after)
+    control.stop()
+    runner.join()
+    return control.stop_latency()
+
+def main():
+    parser = argparse.ArgumentParser(description="Mesure du délai entre Stop et l'arrêt complet")
+    parser.add_argument("--texts", type=int, default=8)
+    parser.add_argument("--text-mb", type=int, default=50, help="taille de chaque fichier texte (Mo)")
+    parser.add_argument("--video", help="vidéo copiée dans le corpus pour mesurer l'arrêt de ffmpeg")
+    parser.add_argument("--videos", type=int, default=2)
+    parser.add_argument("--after", type=float, default=2.0, help="secondes avant d'appuyer sur Stop")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="sc-bench-") as root:
+        source = os.path.join(root, "src")
+        os.makedirs(source)
+        build_corpus(source, args.texts, args.text_mb, args.video, args.videos)
+        for n in range(args.runs):
+            output = os.path.join(root, f"out{n}")
+            latency = measure(source, output, args.after)
+            leftovers = [
+                name for _, _, names in os.walk(output) for name in names if ".part" in name
+            ]
+            print(f"run {n + 1}: stop latency={latency:.3f}s  partial outputs left={len(leftovers)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import os
+import json
+import time
+import platform
+import threading
+import config
+from compressors.video_compressor import benchmark_profile, encoder_settings, output_pixel_rate
+from scheduler import TimeBudgetPlanner, video_work
+from utils.paths import cache_dir
+
+CACHE_FILE = "calibration.json"
+
+_lock = threading.Lock()
+
+def machine_key():
+    return f"{platform.node()}:{platform.machine()}:{os.cpu_count()}"
+
+def _path():
+    return cache_dir() / CACHE_FILE
+
+def _read():
+    try:
+        with open(_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write(data):
+    path = _path()
+    tmp = path.with_suffix(".tmp")
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+def _valid(entry, profile):
+    if not entry or time.time() - entry.get("measured_at", 0) > config.CALIBRATION_MAX_AGE_DAYS * 86400:
+        return False
+    settings = encoder_settings(entry.get("codec"), profile)
+    return entry.get("preset") == settings["preset"] and entry.get("params") == settings["params"]
+
+def load_rates():
+    with _lock:
+        entries = _read().get(machine_key(), {})
+    return {
+        profile: entry["rate"]
+        for profile, entry in entries.items()
+        if profile in config.ENCODER_PROFILES and _valid(entry, profile)
+    }
+
+# Rates are output pixel-frames encoded per second by one job of each profile.
+def calibrate(src, probe, force=False):
+    rates = {} if force else load_rates()
+    measured = {}
+    for profile in config.ENCODER_PROFILES:
+        if profile in rates:
+            continue
+        try:
+            result = benchmark_profile(src, profile, probe, clip=config.CALIBRATION_SECONDS)
+        except (OSError, RuntimeError):
+            continue
+        if not result or result["seconds"] <= 0:
+            continue
+        settings = encoder_settings(result["codec"], profile)
+        measured[profile] = {
+            "codec": result["codec"],
+            "preset": settings["preset"],
+            "params": settings["params"],
+            "rate": output_pixel_rate(probe) * result["clip"] / result["seconds"],
+            "measured_at": time.time(),
+        }
+    if measured:
+        with _lock:
+            data = _read()
+            data.setdefault(machine_key(), {}).update(measured)
+            _write(data)
+    rates.update({profile: entry["rate"] for profile, entry in measured.items()})
+    return rates
+
+def plan_time_budget(records, probes, use_gpu=False):
+    if config.VIDEO_TIME_BUDGET_HOURS <= 0:
+        return None
+    started = time.monotonic()
+    candidates = [record for record in records if video_work(record, probes.get(record.path), use_gpu) > 0]
+    if not candidates:
+        return None
+    sample = max(candidates, key=lambda record: record.size)
+    rates = calibrate(sample.path, probes.get(sample.path))
+    if not rates:
+        return None
+    seconds = config.VIDEO_TIME_BUDGET_HOURS * 3600 - (time.monotonic() - started)
+    return TimeBudgetPlanner(records, probes, rates, seconds, use_gpu)
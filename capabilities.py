@@ -0,0 +1,197 @@
+import os
+import json
+import shutil
+import subprocess
+import threading
+from setup_check import get_ffmpeg_paths
+from utils.paths import cache_dir
+from utils.process import hidden_process_kwargs
+
+CACHE_FILE = "capabilities.json"
+
+# Encoders tried after the preferred ones; the first encoder that is available
+# and has not failed during the run is used.
+FALLBACK_ENCODERS = ("libx265", "libx264")
+HARDWARE_SUFFIXES = ("_nvenc", "_qsv", "_amf", "_vaapi", "_videotoolbox")
+SMOKE_TEST_TIMEOUT = 20
+
+def is_hardware(encoder):
+    return encoder.endswith(HARDWARE_SUFFIXES)
+
+def parse_encoders(output):
+    encoders, listing = [], False
+    for line in output.splitlines():
+        parts = line.split()
+        if not listing:
+            listing = bool(parts) and set(parts[0]) == {"-"}
+            continue
+        if len(parts) >= 2 and parts[0][:1] in "VAS":
+            encoders.append(parts[1])
+    return encoders
+
+def parse_hwaccels(output):
+    lines = [line.strip() for line in output.splitlines()]
+    if lines and lines[0].endswith(":"):
+        lines = lines[1:]
+    return [line for line in lines if line]
+
+class Capabilities:
+    def __init__(self, ffmpeg=None, env=None, cache_path=None):
+        default_ffmpeg, _, default_env = get_ffmpeg_paths()
+        self.ffmpeg = ffmpeg or default_ffmpeg
+        self.env = env or default_env
+        self.cache_path = str(cache_path or cache_dir() / CACHE_FILE)
+        self._lock = threading.Lock()
+        self._info = None
+        self._binary_key = None
+        self._works = {}
+        self._failed = set()
+
+    def _binary(self):
+        if os.path.dirname(self.ffmpeg):
+            return os.path.abspath(self.ffmpeg)
+        return shutil.which(self.ffmpeg, path=self.env.get("PATH"))
+
+    def _run(self, *args):
+        result = subprocess.run(
+            [self.ffmpeg, "-hide_banner", *args],
+            capture_output=True,
+            text=True,
+            env=self.env,
+            timeout=SMOKE_TEST_TIMEOUT,
+            **hidden_process_kwargs(),
+        )
+        return result.returncode, result.stdout or ""
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_cache(self, data):
+        tmp = self.cache_path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp, self.cache_path)
+        except OSError:
+            pass
+
+    def _load(self):
+        with self._lock:
+            if self._info is not None:
+                return self._info
+            binary = self._binary()
+            try:
+                mtime = os.path.getmtime(binary) if binary else None
+            except OSError:
+                mtime = None
+            if mtime is None:
+                self._info = {"encoders": [], "hwaccels": []}
+                return self._info
+            data = self._read_cache()
+            entry = data.get(binary)
+            if not entry or entry.get("mtime") != mtime:
+                try:
+                    _, encoders = self._run("-encoders")
+                    _, hwaccels = self._run("-hwaccels")
+                except (OSError, subprocess.SubprocessError):
+                    self._info = {"encoders": [], "hwaccels": []}
+                    return self._info
+                entry = {
+                    "mtime": mtime,
+                    "encoders": parse_encoders(encoders),
+                    "hwaccels": parse_hwaccels(hwaccels),
+                    "works": {},
+                }
+                data[binary] = entry
+                self._write_cache(data)
+            self._binary_key = binary
+            self._works = dict(entry.get("works") or {})
+            self._info = {"encoders": entry["encoders"], "hwaccels": entry["hwaccels"]}
+            return self._info
+
+    @property
+    def encoders(self):
+        return self._load()["encoders"]
+
+    @property
+    def hwaccels(self):
+        return self._load()["hwaccels"]
+
+    def has_encoder(self, name):
+        return name in self.encoders
+
+    # Smoke-test results are cached with the encoder list, so they are only
+    # rerun when the ffmpeg binary changes.
+    def works(self, name):
+        self._load()
+        with self._lock:
+            if name in self._works:
+                return self._works[name]
+        try:
+            returncode, _ = self._run(
+                "-f", "lavfi", "-i", "color=c=black:s=256x256:d=0.1",
+                "-frames:v", "2", "-c:v", name, "-f", "null", "-",
+            )
+            ok = returncode == 0
+        except (OSError, subprocess.SubprocessError):
+            ok = False
+        with self._lock:
+            self._works[name] = ok
+            if self._binary_key:
+                data = self._read_cache()
+                entry = data.get(self._binary_key)
+                if entry:
+                    entry.setdefault("works", {})[name] = ok
+                    self._write_cache(data)
+        return ok
+
+    def chain(self, preferred):
+        encoders = self.encoders
+        with self._lock:
+            failed = set(self._failed)
+        return [
+            name for name in dict.fromkeys((*preferred, *FALLBACK_ENCODERS))
+            if name not in failed and (not encoders or name in encoders)
+        ]
+
+    def mark_failed(self, name):
+        with self._lock:
+            self._failed.add(name)
+
+    def failed(self):
+        with self._lock:
+            return set(self._failed)
+
+    def reset(self):
+        with self._lock:
+            self._failed.clear()
+
+_capabilities = None
+_capabilities_lock = threading.Lock()
+
+def get_capabilities():
+    global _capabilities
+    with _capabilities_lock:
+        if _capabilities is None:
+            _capabilities = Capabilities()
+        return _capabilities
+
+def set_capabilities(capabilities):
+    global _capabilities
+    with _capabilities_lock:
+        previous, _capabilities = _capabilities, capabilities
+    return previous
+
+def has_nvenc(capabilities=None):
+    capabilities = capabilities or get_capabilities()
+    return any(
+        capabilities.has_encoder(name) and capabilities.works(name)
+        for name in ("hevc_nvenc", "h264_nvenc")
+    )
+
+def reset_failures():
+    get_capabilities().reset()
@@ -1,16 +1,19 @@
 from PIL import Image
 import os
-import shutil
 import config
+from utils.cancel import Cancelled, check_cancelled
+from utils.files import copy_file
 
-def compress(src, dst, use_gpu=False, progress_callback=None):
+def compress(src, dst, use_gpu=False, progress_callback=None, control=None):
     try:
-        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        check_cancelled(control)
         ext = os.path.splitext(src)[1].lower()
         original_size = os.path.getsize(src)
         quality = config.IMAGE_QUALITY
 
         with Image.open(src) as img:
+            img.load()
+            check_cancelled(control)
 
             if img.mode == "P" and "transparency" in img.info:
                 img = img.convert("RGBA")
@@ -19,6 +22,7 @@ def compress(src, dst, use_gpu=False, progress_callback=None):
 
                 if img.mode in ("RGBA", "LA"):
                     img = img.convert("RGB")
+                check_cancelled(control)
 
                 if ext == ".webp":
                     img.save(
@@ -32,7 +36,7 @@ def compress(src, dst, use_gpu=False, progress_callback=None):
 
             else:
 
-                shutil.copy2(src, dst)
+                copy_file(src, dst, control)
                 if progress_callback:
                     progress_callback(100)
                 return True
@@ -44,7 +48,7 @@ def compress(src, dst, use_gpu=False, progress_callback=None):
                 os.remove(dst)
             except Exception:
                 pass
-            shutil.copy2(src, dst)
+            copy_file(src, dst, control)
 
         if progress_callback:
             progress_callback(100)
@@ -55,6 +59,14 @@ def compress(src, dst, use_gpu=False, progress_callback=None):
             progress_callback(100)
         return False
 
+    except Cancelled:
+        try:
+            if os.path.isfile(dst):
+                os.remove(dst)
+        except OSError:
+            pass
+        raise
+
     except Exception:
         try:
             if os.path.isfile(dst):
@@ -1,12 +1,14 @@
 import fitz
-import os
-
-def compress(src, dst, use_gpu=False, progress_callback=None):
-    os.makedirs(os.path.dirname(dst), exist_ok=True)
+from utils.cancel import check_cancelled
 
+def compress(src, dst, use_gpu=False, progress_callback=None, control=None):
+    check_cancelled(control)
     doc = fitz.open(src)
-    doc.save(dst, garbage=4, deflate=True)
-    doc.close()
+    try:
+        check_cancelled(control)
+        doc.save(dst, garbage=4, deflate=True)
+    finally:
+        doc.close()
 
     if progress_callback:
         progress_callback(100)
@@ -1,21 +1,31 @@
-import os
-import shutil
+from utils.cancel import Cancelled, check_cancelled
+from utils.files import copy_file
 
-def compress(src, dst, use_gpu=False, progress_callback=None):
-    try:
-        os.makedirs(os.path.dirname(dst), exist_ok=True)
-        with open(src, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-
-        lines = [line.strip() for line in lines if line.strip()]
+CANCEL_CHECK_LINES = 10_000
 
-        with open(dst, "w", encoding="utf-8") as f:
-            f.write("\n".join(lines))
+def compress(src, dst, use_gpu=False, progress_callback=None, control=None):
+    try:
+        check_cancelled(control)
+        with open(src, "r", encoding="utf-8") as fsrc, open(dst, "w", encoding="utf-8") as fdst:
+            first = True
+            for number, line in enumerate(fsrc, 1):
+                if number % CANCEL_CHECK_LINES == 0:
+                    check_cancelled(control)
+                line = line.strip()
+                if not line:
+                    continue
+                if not first:
+                    fdst.write("\n")
+                fdst.write(line)
+                first = False
 
         if progress_callback:
             progress_callback(100)
 
+    except Cancelled:
+        raise
+
     except Exception:
-        shutil.copy2(src, dst)
+        copy_file(src, dst, control)
         if progress_callback:
             progress_callback(100)
@@ -1,115 +1,810 @@
 import subprocess
 import os
+import shutil
+import tempfile
+import re
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import config
 
-from utils.paths import bundled_path
-from utils.process import hidden_process_kwargs
+from analysis_cache import AnalysisCache
+from capabilities import get_capabilities, is_hardware
+from probe import probe_path
+from scanner import FileRecord
+from utils.cancel import Cancelled, check_cancelled, is_cancelled
+from utils.files import copy_file
+from utils.process import hidden_process_kwargs, terminate_process
 
-def compress(src, dst, use_gpu=False, progress_callback=None, control=None):
+THREAD_BUDGETS = (
+    (1280 * 720, 2),
+    (1920 * 1080, 4),
+    (2560 * 1440, 6),
+)
+MAX_THREAD_BUDGET = 8
+DEFAULT_THREAD_BUDGET = 4
+NVENC_THREADS = 2
+DEFAULT_ENCODER = {"preset": "medium", "tune": "", "params": "", "crf_offset": 0, "max_threads": MAX_THREAD_BUDGET,
+                   "size_factor": 1.0, "cost_factor": 1.0}
+GPU_EXTENSIONS_EXCLUDED = (".mp4", ".mov", ".mkv")
+
+# Bits per pixel and frame produced by libx265 at CRF 28 on typical footage;
+# the bitrate roughly doubles every 6 CRF steps below that.
+VIDEO_BPP_AT_CRF28 = 0.035
+EFFICIENT_CODECS = ("hevc", "av1", "vp9")
+LEGACY_COPY_FACTOR = 0.5
+REMUX_MIN_OVERHEAD = 0.10
+
+# An encode is abandoned once, past ABORT_MIN_PROGRESS of the duration, the
+# output size projected from ffmpeg's total_size exceeds the source by
+# ABORT_MARGIN.
+ABORT_MIN_PROGRESS = 0.15
+ABORT_MARGIN = 1.05
+
+FIRST_PASS_WEIGHT = 0.3
+MIN_VIDEO_BITRATE = 100_000
+
+CRF_SEARCH_MIN = 18
+CRF_SEARCH_MAX = 36
+CRF_SEARCH_CLIPS = 2
+# Cached in place of a CRF when no CRF in the search range reaches the target.
+CRF_MISSED = -1
+QUALITY_PATTERNS = {
+    "ssim": re.compile(r"SSIM .*All:([0-9.]+)"),
+    "psnr": re.compile(r"PSNR .*average:([0-9.]+|inf)"),
+}
+
+_trial_slots = threading.BoundedSemaphore(max(1, (config.MAX_WORKERS or 4) // DEFAULT_THREAD_BUDGET))
+
+AUDIO_BITRATE = 128_000
+AUDIO_COPY_MAX_BITRATE_PER_CHANNEL = 128_000
+LOSSLESS_AUDIO = ("flac", "alac", "truehd", "mlp", "wavpack", "ape", "tta")
+MP4_AUDIO = ("aac", "mp3", "ac3", "eac3", "alac", "opus")
+TS_AUDIO = ("aac", "mp3", "mp2", "ac3", "eac3")
+
+# Codecs each output container takes as-is (None: anything) and what the
+# streams it cannot take are converted to.
+CONTAINER_AUDIO = {
+    ".mp4": MP4_AUDIO, ".m4v": MP4_AUDIO, ".mov": MP4_AUDIO, ".3gp": ("aac", "amr_nb", "amr_wb"),
+    ".mkv": None,
+    ".webm": ("opus", "vorbis"), ".ogv": ("opus", "vorbis", "flac"),
+    ".avi": ("mp3", "ac3", "aac"), ".flv": ("aac", "mp3"), ".wmv": ("wmav2", "wmapro"),
+    ".ts": TS_AUDIO, ".mts": TS_AUDIO, ".m2ts": TS_AUDIO, ".vob": ("ac3", "mp2", "dts"),
+}
+AUDIO_ENCODER = {".webm": "libopus", ".ogv": "libopus", ".wmv": "wmav2", ".vob": "ac3"}
+TEXT_SUBTITLES = ("subrip", "ass", "ssa", "mov_text", "webvtt", "text")
+CONTAINER_SUBTITLES = {
+    ".mp4": ("mov_text",), ".m4v": ("mov_text",), ".mov": ("mov_text",), ".3gp": ("mov_text",),
+    ".mkv": None,
+    ".webm": ("webvtt",),
+    ".ts": ("dvb_subtitle", "dvb_teletext"), ".mts": ("hdmv_pgs_subtitle",), ".m2ts": ("hdmv_pgs_subtitle",),
+    ".vob": ("dvd_subtitle",),
+}
+DATA_CONTAINERS = (".mp4", ".m4v", ".mov")
+
+def encoder_settings(codec, profile=None):
+    profiles = config.ENCODER_PROFILES
+    ordered = (profiles.get(profile or config.VIDEO_PROFILE, ()), *profiles.values())
+    settings = next((variant for variants in ordered for variant in variants if variant["codec"] == codec), {})
+    return {**DEFAULT_ENCODER, "codec": codec, **settings}
+
+def profile_encoders(profile=None):
+    return [variant["codec"] for variant in config.ENCODER_PROFILES[profile or config.VIDEO_PROFILE]]
+
+def encoder_chain(ext, use_gpu, profile=None):
+    preferred = profile_encoders(profile)
+    if use_gpu and ext not in GPU_EXTENSIONS_EXCLUDED:
+        preferred.insert(0, "hevc_nvenc")
+    return get_capabilities().chain(preferred)
+
+def select_encoder(ext, use_gpu, profile=None):
+    chain = encoder_chain(ext, use_gpu, profile)
+    final_codec = chain[0] if chain else "libx265"
+    return final_codec, is_hardware(final_codec)
+
+def thread_budget(probe, use_nvenc=False, codec=None, profile=None):
+    if use_nvenc:
+        return NVENC_THREADS
+    max_threads = encoder_settings(codec, profile)["max_threads"] if codec else MAX_THREAD_BUDGET
+    video = (probe or {}).get("video") or {}
+    pixels = (video.get("width") or 0) * (video.get("height") or 0)
+    if not pixels:
+        budget = DEFAULT_THREAD_BUDGET
+    else:
+        budget = next((threads for limit, threads in THREAD_BUDGETS if pixels <= limit), max_threads)
+    budget = min(budget, max_threads)
+    return max(1, min(budget, config.MAX_WORKERS or budget))
+
+def is_segmented(probe, use_nvenc=False):
+    duration = (probe or {}).get("duration") or 0.0
+    return not use_nvenc and config.VIDEO_MODE == "crf" and duration >= config.SEGMENT_MIN_DURATION
+
+def target_bpp(crf=None):
+    crf = config.VIDEO_CRF if crf is None else crf
+    return VIDEO_BPP_AT_CRF28 * 2 ** ((28 - crf) / 6)
+
+def _audio_rate(probe):
+    return sum(stream.get("bit_rate") or 0 for stream in probe.get("audio") or [])
+
+def bits_per_pixel(probe):
+    video = (probe or {}).get("video") or {}
+    pixel_rate = (video.get("width") or 0) * (video.get("height") or 0) * (video.get("fps") or 0)
+    if not pixel_rate:
+        return None
+    rate = video.get("bit_rate") or max(0, (probe.get("bit_rate") or 0) - _audio_rate(probe))
+    return rate / pixel_rate if rate else None
+
+def container_overhead(probe):
+    total = probe.get("bit_rate") or 0
+    video = (probe.get("video") or {}).get("bit_rate") or 0
+    if not total or not video:
+        return 0.0
+    return max(0.0, 1 - (video + _audio_rate(probe)) / total)
+
+def target_size(source_size):
+    if config.VIDEO_TARGET_MB > 0:
+        return config.VIDEO_TARGET_MB * 1024 * 1024
+    return int(source_size * config.VIDEO_TARGET_PERCENT / 100)
+
+def output_audio_rate(probe, ext):
+    return sum(
+        stream.get("bit_rate") or AUDIO_BITRATE
+        if audio_codec(stream, ext) == "copy"
+        else AUDIO_BITRATE
+        for stream in (probe or {}).get("audio") or []
+    )
+
+def target_bitrate(probe, ext, source_size):
+    duration = (probe or {}).get("duration")
+    if not duration:
+        return None
+    rate = target_size(source_size) * 8 / duration - output_audio_rate(probe, ext)
+    return max(MIN_VIDEO_BITRATE, int(rate))
+
+def cap_filters(probe):
+    video = (probe or {}).get("video") or {}
+    width, height, fps = video.get("width") or 0, video.get("height") or 0, video.get("fps") or 0
+    filters, rules = [], []
+    short_side = min(width, height)
+    if config.VIDEO_MAX_HEIGHT and short_side > config.VIDEO_MAX_HEIGHT:
+        scale = f"{config.VIDEO_MAX_HEIGHT}:-2" if width < height else f"-2:{config.VIDEO_MAX_HEIGHT}"
+        filters.append(f"scale={scale}")
+        rules.append(f"{short_side}p -> {config.VIDEO_MAX_HEIGHT}p")
+    if config.VIDEO_MAX_FPS and fps > config.VIDEO_MAX_FPS + 0.5:
+        filters.append(f"fps={config.VIDEO_MAX_FPS}")
+        rules.append(f"{fps:.4g} fps -> {config.VIDEO_MAX_FPS} fps")
+    return filters, rules
+
+def output_pixel_rate(probe):
+    video = (probe or {}).get("video") or {}
+    width, height, fps = video.get("width") or 0, video.get("height") or 0, video.get("fps") or 30
+    short_side = min(width, height)
+    if config.VIDEO_MAX_HEIGHT and short_side > config.VIDEO_MAX_HEIGHT:
+        factor = config.VIDEO_MAX_HEIGHT / short_side
+        width, height = width * factor, height * factor
+    if config.VIDEO_MAX_FPS and fps > config.VIDEO_MAX_FPS + 0.5:
+        fps = config.VIDEO_MAX_FPS
+    return width * height * fps
+
+def decide(probe, size=None):
+    _, rules = cap_filters(probe)
+    if rules:
+        return "encode", ", ".join(rules)
+    if config.VIDEO_MODE == "size":
+        if size is not None and size <= target_size(size):
+            return "copy", f"source {size} B <= target {target_size(size)} B"
+        return "encode", "target size"
+    bpp = bits_per_pixel(probe)
+    if bpp is None:
+        return "encode", "bitrate unknown"
+    codec = probe["video"].get("codec") or "?"
+    target = target_bpp()
+    efficient = codec in EFFICIENT_CODECS and bpp <= target
+    if not efficient and bpp > target * LEGACY_COPY_FACTOR:
+        return "encode", f"{codec} {bpp:.3f} bpp > {target:.3f}"
+    overhead = container_overhead(probe)
+    if overhead >= REMUX_MIN_OVERHEAD:
+        return "remux", f"{codec} {bpp:.3f} bpp <= {target:.3f}, container overhead {overhead:.0%}"
+    return "copy", f"{codec} {bpp:.3f} bpp <= {target:.3f}"
+
+def audio_codec(stream, ext):
+    allowed = CONTAINER_AUDIO.get(ext, ())
+    codec = stream.get("codec") or ""
+    compatible = allowed is None or codec in allowed
+    limit = AUDIO_COPY_MAX_BITRATE_PER_CHANNEL * max(1, stream.get("channels") or 2)
+    heavy = codec.startswith("pcm_") or codec in LOSSLESS_AUDIO or (stream.get("bit_rate") or 0) > limit
+    if compatible and not heavy:
+        return "copy"
+    return AUDIO_ENCODER.get(ext, "aac")
+
+def subtitle_codec(stream, ext):
+    if ext not in CONTAINER_SUBTITLES:
+        return None
+    allowed = CONTAINER_SUBTITLES[ext]
+    codec = stream.get("codec") or ""
+    if allowed is None or codec in allowed:
+        return "copy"
+    if codec in TEXT_SUBTITLES and allowed[0] in TEXT_SUBTITLES:
+        return allowed[0]
+    return None
+
+def audio_args(probe, ext, source=0):
+    if not probe or "subtitles" not in probe:
+        return ["-map", f"{source}:a?", "-c:a", "aac"]
+    args = []
+    for n, stream in enumerate(probe["audio"]):
+        codec = audio_codec(stream, ext)
+        args += ["-map", f"{source}:{stream['index']}", f"-c:a:{n}", codec]
+        if codec != "copy":
+            args += [f"-b:a:{n}", str(AUDIO_BITRATE * max(1, (stream.get("channels") or 2) // 2))]
+    return args
+
+def stream_args(probe, ext, source=0, video_map=None):
+    video = (probe or {}).get("video") or {}
+    if video_map is None:
+        video_map = f"{source}:{video['index']}" if "index" in video else f"{source}:v:0"
+    args = ["-map", video_map, *audio_args(probe, ext, source)]
+    if not probe or "subtitles" not in probe:
+        return args
+
+    n = 0
+    for stream in probe["subtitles"]:
+        codec = subtitle_codec(stream, ext)
+        if codec is not None:
+            args += ["-map", f"{source}:{stream['index']}", f"-c:s:{n}", codec]
+            n += 1
+
+    if ext == ".mkv":
+        attachments = [stream for stream in probe["data"] if stream.get("type") == "attachment"]
+        for stream in attachments:
+            args += ["-map", f"{source}:{stream['index']}"]
+        if attachments:
+            args += ["-c:t", "copy"]
+    elif ext in DATA_CONTAINERS:
+        data = [stream for stream in probe["data"] if stream.get("type") == "data"]
+        for stream in data:
+            args += ["-map", f"{source}:{stream['index']}"]
+        if data:
+            args += ["-c:d", "copy"]
+    return args
+
+def _read_progress(process, on_progress, control, output=None):
+    if not process.stdout:
+        return
+    total_size = 0
+    for line in process.stdout:
+        if is_cancelled(control):
+            terminate_process(process)
+            break
+        line = line.strip()
+        if output is not None:
+            output.append(line)
+        if line.startswith("total_size="):
+            try:
+                total_size = int(line.split("=", 1)[1].strip())
+            except ValueError:
+                continue
+        elif on_progress and line.startswith("out_time_ms="):
+            try:
+                seconds = int(line.split("=", 1)[1].strip()) / 1_000_000.0
+            except ValueError:
+                continue
+            if on_progress(seconds, total_size):
+                terminate_process(process)
+                break
+
+def projected_size(seconds, total_size, total_duration):
+    if seconds <= 0 or total_size <= 0 or seconds < total_duration * ABORT_MIN_PROGRESS:
+        return None
+    return int(total_size * total_duration / seconds)
+
+def _run_ffmpeg(cmd, env, on_progress=None, control=None, output=None):
+    process = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        bufsize=1,
+        env=env,
+        **hidden_process_kwargs(new_group=True)
+    )
+    if control is not None:
+        control.register(process)
     try:
-        if not os.path.isfile(src):
-            raise FileNotFoundError(f"Source vidéo introuvable: {src}")
+        _read_progress(process, on_progress, control, output)
+        process.wait()
+    finally:
+        if control is not None:
+            control.unregister(process)
+    return process.returncode
 
-        os.makedirs(os.path.dirname(dst), exist_ok=True)
-        ext_lower = os.path.splitext(src)[1].lower()
-        crf = config.VIDEO_CRF
+def _compress_segments(ffmpeg, env, src, dst, final_codec, crf, threads, streams, total_duration, progress_callback,
+                       control, filters=None):
+    work_dir = tempfile.mkdtemp(prefix=".sc-segments-", dir=os.path.dirname(dst) or None)
+    try:
+        split_cmd = [
+            ffmpeg, "-y", "-i", src,
+            "-map", "0:v:0", "-c", "copy", "-an",
+            "-f", "segment",
+            "-segment_time", str(config.SEGMENT_SECONDS),
+            "-reset_timestamps", "1",
+            os.path.join(work_dir, "src_%05d.mkv"),
+        ]
+        if _run_ffmpeg(split_cmd, env, control=control) != 0:
+            raise RuntimeError("FFmpeg n'a pas pu découper la vidéo en segments")
+        segments = sorted(name for name in os.listdir(work_dir) if name.startswith("src_"))
+        if not segments:
+            raise RuntimeError("Aucun segment produit")
 
-        ffmpeg = str(bundled_path("ffmpeg/ffmpeg.exe"))
-        ffprobe = str(bundled_path("ffmpeg/ffprobe.exe"))
-        env = os.environ.copy()
-        ff_dir = str(bundled_path("ffmpeg"))
-        env["PATH"] = ff_dir + os.pathsep + env.get("PATH", "")
-
-        if ext_lower in (".mp4", ".mov", ".mkv"):
-            final_codec = "libx265"
-            use_nvenc = False
-        elif use_gpu:
-            final_codec = "hevc_nvenc"
-            use_nvenc = True
-        else:
-            final_codec = "libx265"
-            use_nvenc = False
+        threads = threads or thread_budget(None, codec=final_codec)
+        workers = max(1, min(len(segments), (config.MAX_WORKERS or threads) // threads))
+        positions = {}
+        lock = threading.Lock()
 
-        total_duration = 0.0
-        process_kwargs = hidden_process_kwargs()
-        try:
-            result = subprocess.run(
-                [ffprobe, "-v", "error", "-show_entries", "format=duration",
-                 "-of", "default=noprint_wrappers=1:nokey=1", src],
-                capture_output=True, text=True, env=env, **process_kwargs
-            )
-            if result.returncode != 0:
-                details = (result.stderr or result.stdout or "échec de ffprobe").strip()
-                raise RuntimeError(f"Vidéo illisible: {details[-500:]}")
-            out = (result.stdout or "").strip()
-            total_duration = float(out) if out else 0.0
-        except (OSError, ValueError, subprocess.SubprocessError):
-            total_duration = 0.0
-
-        if use_nvenc:
+        def report(name, seconds):
+            if not progress_callback or total_duration <= 0:
+                return
+            with lock:
+                positions[name] = seconds
+                done = sum(positions.values())
+            progress_callback(min(99.0, done / total_duration * 100.0))
+
+        def encode(name):
+            check_cancelled(control)
             cmd = [
-                ffmpeg, "-y", "-i", src,
-                "-c:v", final_codec, "-rc", "vbr_hq", "-cq", str(crf),
-                "-b:v", "0", "-preset", "slow",
-                "-c:a", "aac",
+                ffmpeg, "-y", "-threads", str(threads),
+                "-i", os.path.join(work_dir, name),
+                *_video_args(final_codec, False, crf, threads, filters=filters),
+                "-an",
                 "-progress", "pipe:1",
-                dst
+                os.path.join(work_dir, "enc" + name[3:]),
             ]
-        else:
-            cmd = [
-                ffmpeg, "-y", "-i", src,
-                "-c:v", final_codec,
-                "-preset", "medium",
-                "-crf", str(crf),
-                "-x265-params",
-                "threads=auto:rc-lookahead=20:b-intra=0:aq-mode=2:psy-rd=1.0:sao=0",
-                "-c:a", "aac",
+            return _run_ffmpeg(cmd, env, lambda seconds, _: report(name, seconds), control)
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="segment") as pool:
+            codes = list(pool.map(encode, segments))
+        check_cancelled(control)
+        if any(codes):
+            raise RuntimeError("FFmpeg a échoué sur un segment")
+
+        concat_list = os.path.join(work_dir, "segments.txt")
+        with open(concat_list, "w", encoding="utf-8") as f:
+            for name in segments:
+                path = os.path.join(work_dir, "enc" + name[3:]).replace("'", "'\\''")
+                f.write(f"file '{path}'\n")
+
+        join_cmd = [
+            ffmpeg, "-y",
+            "-f", "concat", "-safe", "0", "-i", concat_list,
+            "-i", src,
+            *streams,
+            "-c:v", "copy",
+            dst,
+        ]
+        if _run_ffmpeg(join_cmd, env, control=control) != 0:
+            raise RuntimeError("FFmpeg n'a pas pu réassembler les segments")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def _video_args(final_codec, use_nvenc, crf, threads, bitrate=None, encode_pass=None, filters=None):
+    filter_args = ["-vf", ",".join(filters)] if filters else []
+    if use_nvenc:
+        if bitrate:
+            return [
+                *filter_args,
+                "-c:v", final_codec, "-rc", "vbr", "-b:v", str(bitrate),
+                "-maxrate", str(int(bitrate * 1.5)), "-multipass", "fullres", "-preset", "slow",
+            ]
+        return [*filter_args, "-c:v", final_codec, "-rc", "vbr_hq", "-cq", str(crf), "-b:v", "0", "-preset", "slow"]
+    settings = encoder_settings(final_codec)
+    rate = ["-b:v", str(bitrate)] if bitrate else ["-crf", str(max(0, crf + settings["crf_offset"]))]
+    tune = ["-tune", settings["tune"]] if settings["tune"] else []
+    if final_codec == "libx265":
+        params = [f"pools={threads}" if threads else "threads=auto", settings["params"]]
+        if encode_pass:
+            stats = encode_pass[1].replace("\\", "/").replace(":", "\\:")
+            params.append(f"pass={encode_pass[0]}:stats={stats}:slow-firstpass=0")
+        params = ":".join(param for param in params if param)
+        return [*filter_args, "-c:v", final_codec, "-preset", settings["preset"], *tune, *rate, "-x265-params", params]
+    pass_args = ["-pass", str(encode_pass[0]), "-passlogfile", encode_pass[1]] if encode_pass else []
+    thread_args = ["-threads", str(threads)] if threads else []
+    if final_codec == "libsvtav1":
+        params = ":".join(param for param in (settings["params"], f"lp={threads}" if threads else "") if param)
+        private = ["-svtav1-params", params] if params else []
+        return [*filter_args, "-c:v", final_codec, "-preset", settings["preset"], *rate, *private, *pass_args]
+    if final_codec == "libaom-av1":
+        rate = rate if bitrate else [*rate, "-b:v", "0"]
+        return [
+            *filter_args, "-c:v", final_codec, "-cpu-used", settings["preset"], "-row-mt", "1",
+            *thread_args, *tune, *rate, *pass_args,
+        ]
+    private = ["-x264-params", settings["params"]] if final_codec == "libx264" and settings["params"] else []
+    return [
+        *filter_args, "-c:v", final_codec, "-preset", settings["preset"], *thread_args,
+        *tune, *rate, *private, *pass_args,
+    ]
+
+def _encode(ffmpeg, env, src, dst, source_size, final_codec, use_nvenc, crf, threads, streams, total_duration,
+            progress_callback, control, bitrate=None, filters=None):
+    thread_args = ["-threads", str(threads)] if threads else []
+    projection = {"size": None}
+    two_pass = bool(bitrate) and not use_nvenc
+    offset, scale = (FIRST_PASS_WEIGHT, 1 - FIRST_PASS_WEIGHT) if two_pass else (0.0, 1.0)
+
+    def report(seconds, total_size):
+        if total_duration <= 0:
+            return False
+        if progress_callback:
+            progress_callback(min(100.0, (offset + scale * seconds / total_duration) * 100.0))
+        projected = projected_size(seconds, total_size, total_duration)
+        if projected is not None and projected > source_size * ABORT_MARGIN:
+            projection["size"] = projected
+            return True
+        return False
+
+    def report_first_pass(seconds, _):
+        if progress_callback and total_duration > 0:
+            progress_callback(min(100.0, FIRST_PASS_WEIGHT * seconds / total_duration * 100.0))
+        return False
+
+    stats_dir = tempfile.mkdtemp(prefix=".sc-2pass-", dir=os.path.dirname(dst) or None) if two_pass else None
+    try:
+        encode_pass = None
+        if two_pass:
+            stats = os.path.join(stats_dir, "pass.log")
+            first_pass = [
+                ffmpeg, "-y", *thread_args, "-i", src,
+                "-map", "0:v:0",
+                *_video_args(final_codec, use_nvenc, crf, threads, bitrate, (1, stats), filters),
+                "-an", "-sn", "-dn",
                 "-progress", "pipe:1",
-                dst
+                "-f", "null", os.devnull,
             ]
+            returncode = _run_ffmpeg(first_pass, env, report_first_pass, control)
+            if returncode != 0:
+                raise RuntimeError(f"FFmpeg a échoué en première passe (code {returncode})")
+            encode_pass = (2, stats)
+
+        cmd = [
+            ffmpeg, "-y", *thread_args, "-i", src,
+            *_video_args(final_codec, use_nvenc, crf, threads, bitrate, encode_pass, filters),
+            *streams,
+            "-progress", "pipe:1",
+            dst
+        ]
+        returncode = _run_ffmpeg(cmd, env, report, control)
+    finally:
+        if stats_dir:
+            shutil.rmtree(stats_dir, ignore_errors=True)
 
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,
-            env=env,
-            **process_kwargs
+    if projection["size"] is not None:
+        return projection["size"]
+
+    if returncode != 0 or not os.path.isfile(dst):
+        raise RuntimeError(
+            f"FFmpeg a échoué (code {returncode}) ou n'a pas créé la sortie"
         )
+    return None
 
-        if process.stdout:
-            for line in process.stdout:
-                if control is not None and control.stop_event.is_set():
-                    process.terminate()
-                    break
-                if progress_callback and total_duration > 0:
-                    line = line.strip()
-                    if line.startswith("out_time_ms="):
-                        try:
-                            out_ms = int(line.split("=", 1)[1].strip())
-                            percent = min(100.0, (out_ms / (total_duration * 1_000_000.0)) * 100.0)
-                            progress_callback(percent)
-                        except ValueError:
-                            continue
+def _encode_with_failover(ffmpeg, env, src, dst, source_size, chain, crf, threads, streams, total_duration,
+                          progress_callback, control, bitrate=None, filters=None):
+    capabilities = get_capabilities()
+    error = RuntimeError("Aucun encodeur vidéo disponible")
+    for final_codec in chain:
+        use_nvenc = is_hardware(final_codec)
+        try:
+            projected = _encode(
+                ffmpeg, env, src, dst, source_size, final_codec, use_nvenc, crf,
+                threads, streams, total_duration,
+                progress_callback, control, bitrate, filters,
+            )
+            return projected, final_codec
+        except RuntimeError as e:
+            check_cancelled(control)
+            error = e
+            if not capabilities.works(final_codec):
+                capabilities.mark_failed(final_codec)
+            logging.warning(f"Encoder {final_codec} failed on {src}, trying the next one: {e}")
+    raise error
 
-        process.wait()
+# Encodes run the binary the capabilities were probed for.
+def _ffmpeg_env():
+    capabilities = get_capabilities()
+    return capabilities.ffmpeg, dict(capabilities.env)
+
+def trial_encode(src, probe, use_gpu=False, threads=None, size=None, control=None):
+    duration = (probe or {}).get("duration") or 0.0
+    if not duration or not probe.get("video"):
+        return None
+    source_size = os.path.getsize(src) if size is None else size
+    if decide(probe, source_size)[0] != "encode":
+        return None
+
+    ext = os.path.splitext(src)[1].lower()
+    ffmpeg, env = _ffmpeg_env()
+    final_codec, use_nvenc = select_encoder(ext, use_gpu)
+    threads = threads or thread_budget(probe, use_nvenc, final_codec)
+    bitrate = target_bitrate(probe, ext, source_size) if config.VIDEO_MODE == "size" else None
+    clips = config.TRIAL_CLIPS
+    clip = min(config.TRIAL_CLIP_SECONDS, duration / clips)
+    work_dir = tempfile.mkdtemp(prefix="sc-trial-")
+
+    def encode(n):
+        check_cancelled(control)
+        start = max(0.0, duration * (n + 0.5) / clips - clip / 2)
+        output = os.path.join(work_dir, f"clip_{n}.mkv")
+        cmd = [
+            ffmpeg, "-y", "-threads", str(threads),
+            "-ss", f"{start:.3f}", "-t", f"{clip:.3f}", "-i", src,
+            "-map", "0:v:0",
+            *_video_args(final_codec, use_nvenc, config.VIDEO_CRF, threads, bitrate, filters=cap_filters(probe)[0]),
+            *audio_args(probe, ext),
+            "-sn", "-dn",
+            "-f", "matroska", output,
+        ]
+        with _trial_slots:
+            started = time.monotonic()
+            returncode = _run_ffmpeg(cmd, env, control=control)
+            seconds = time.monotonic() - started
+        if returncode != 0 or not os.path.isfile(output):
+            raise RuntimeError(f"Encodage d'essai échoué (code {returncode})")
+        return os.path.getsize(output), seconds
+
+    try:
+        with ThreadPoolExecutor(max_workers=clips, thread_name_prefix="trial") as pool:
+            results = list(pool.map(encode, range(clips)))
+    except (OSError, RuntimeError, Cancelled):
+        return None
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    encoded = clip * clips
+    size = target_size(source_size) if bitrate else int(sum(size for size, _ in results) * duration / encoded)
+    seconds = sum(seconds for _, seconds in results) * duration / encoded
+    if bitrate and not use_nvenc:
+        seconds *= 1 + FIRST_PASS_WEIGHT
+    return {"size": min(size, source_size), "seconds": seconds}
+
+def quality_target():
+    return config.VIDEO_QUALITY_TARGET or config.QUALITY_TARGETS[config.VIDEO_QUALITY_METRIC]
+
+def _measure_quality(ffmpeg, env, encoded, src, start, clip, filters=None, threads=None, control=None):
+    metric = config.VIDEO_QUALITY_METRIC
+    reference = f"[1:v]{','.join(filters)}[ref];[0:v][ref]" if filters else "[0:v][1:v]"
+    thread_args = ["-threads", str(threads)] if threads else []
+    output = []
+    returncode = _run_ffmpeg(
+        [
+            ffmpeg, "-hide_banner", "-nostats",
+            *thread_args, "-i", encoded,
+            *thread_args, "-ss", f"{start:.3f}", "-t", f"{clip:.3f}", "-i", src,
+            "-lavfi", f"{reference}{metric}",
+            "-f", "null", "-",
+        ],
+        env,
+        control=control,
+        output=output,
+    )
+    check_cancelled(control)
+    match = QUALITY_PATTERNS[metric].search("\n".join(output))
+    if returncode != 0 or not match:
+        raise RuntimeError(f"Mesure {metric} impossible (code {returncode})")
+    return float(match.group(1))
+
+# NUT keeps the source time base; Matroska rounds timestamps to 1 ms, which
+# pairs encoded frames with the wrong reference frames in the metric filter.
+def score_crf(ffmpeg, env, src, output, codec, use_nvenc, crf, threads, start, clip, filters=None, control=None):
+    check_cancelled(control)
+    cmd = [
+        ffmpeg, "-y", "-threads", str(threads),
+        "-ss", f"{start:.3f}", "-t", f"{clip:.3f}", "-i", src,
+        "-map", "0:v:0",
+        *_video_args(codec, use_nvenc, crf, threads, filters=filters),
+        "-an", "-sn", "-dn",
+        "-f", "nut", output,
+    ]
+    returncode = _run_ffmpeg(cmd, env, control=control)
+    check_cancelled(control)
+    if returncode != 0:
+        raise RuntimeError(f"Encodage d'essai échoué (code {returncode})")
+    return _measure_quality(ffmpeg, env, output, src, start, clip, filters, threads, control)
+
+def search_crf(src, probe, use_gpu=False, threads=None, profile=None, control=None):
+    duration = (probe or {}).get("duration") or 0.0
+    if not duration or not probe.get("video"):
+        return None
+    ext = os.path.splitext(src)[1].lower()
+    ffmpeg, env = _ffmpeg_env()
+    final_codec, use_nvenc = select_encoder(ext, use_gpu, profile)
+    threads = threads or thread_budget(probe, use_nvenc, final_codec)
+    # The sample clips are scored side by side and share the job's budget.
+    threads = max(1, threads // CRF_SEARCH_CLIPS)
+    clip = min(config.TRIAL_CLIP_SECONDS, duration / CRF_SEARCH_CLIPS)
+    starts = [max(0.0, duration * (n + 0.5) / CRF_SEARCH_CLIPS - clip / 2) for n in range(CRF_SEARCH_CLIPS)]
+    target = quality_target()
+    filters, _ = cap_filters(probe)
+    work_dir = tempfile.mkdtemp(prefix="sc-crf-")
 
-        if process.returncode != 0 or not os.path.isfile(dst):
-            raise RuntimeError(
-                f"FFmpeg a échoué (code {process.returncode}) ou n'a pas créé la sortie"
+    def score(crf, n):
+        output = os.path.join(work_dir, f"crf{crf}_{n}.nut")
+        with _trial_slots:
+            return score_crf(
+                ffmpeg, env, src, output, final_codec, use_nvenc, crf, threads, starts[n], clip, filters, control,
             )
 
+    low, high, best = CRF_SEARCH_MIN, CRF_SEARCH_MAX, CRF_MISSED
+    try:
+        with ThreadPoolExecutor(max_workers=CRF_SEARCH_CLIPS, thread_name_prefix="crf") as pool:
+            while low <= high:
+                crf = (low + high) // 2
+                if min(pool.map(partial(score, crf), range(CRF_SEARCH_CLIPS))) >= target:
+                    best, low = crf, crf + 1
+                else:
+                    high = crf - 1
+    except (OSError, RuntimeError, ValueError):
+        return None
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return best
+
+def benchmark_profile(src, profile, probe=None, clip=None, start=None, threads=None):
+    probe = probe or probe_path(src)
+    duration = (probe or {}).get("duration") or 0.0
+    video = (probe or {}).get("video") or {}
+    if not duration or not video:
+        return None
+    ext = os.path.splitext(src)[1].lower()
+    codec = next((name for name in encoder_chain(ext, False, profile) if name in profile_encoders(profile)), None)
+    if codec is None:
+        return None
+    ffmpeg, env = _ffmpeg_env()
+    clip = min(clip or config.TRIAL_CLIP_SECONDS, duration)
+    start = max(0.0, duration / 2 - clip / 2) if start is None else start
+    threads = threads or thread_budget(probe, False, codec)
+    work_dir = tempfile.mkdtemp(prefix="sc-bench-")
+    output = os.path.join(work_dir, "sample.mkv")
+    cmd = [
+        ffmpeg, "-y", "-threads", str(threads),
+        "-ss", f"{start:.3f}", "-t", f"{clip:.3f}", "-i", src,
+        "-map", "0:v:0",
+        *_video_args(codec, False, config.VIDEO_CRF, threads, filters=cap_filters(probe)[0]),
+        "-an", "-sn", "-dn",
+        "-f", "matroska", output,
+    ]
+    try:
+        started = time.monotonic()
+        returncode = _run_ffmpeg(cmd, env)
+        seconds = time.monotonic() - started
+        if returncode != 0 or not os.path.isfile(output):
+            raise RuntimeError(f"Encodage de test échoué avec {codec} (code {returncode})")
+        size = os.path.getsize(output)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        "profile": profile,
+        "codec": codec,
+        "seconds": seconds,
+        "clip": clip,
+        "fps": clip * (video.get("fps") or 30) / max(seconds, 1e-6),
+        "size": size,
+        "bytes_per_second": size / clip,
+    }
+
+def crf_key(use_gpu=False, ext=".mp4", profile=None):
+    codec, _ = select_encoder(ext, use_gpu, profile)
+    preset = encoder_settings(codec, profile)["preset"]
+    return (
+        f"{codec}:{profile or config.VIDEO_PROFILE}:{preset}:{config.VIDEO_QUALITY_METRIC}:{quality_target()}:"
+        f"{CRF_SEARCH_MIN}-{CRF_SEARCH_MAX}:{config.VIDEO_MAX_HEIGHT}p:{config.VIDEO_MAX_FPS}fps"
+    )
+
+def find_crf(record, probe, use_gpu=False, threads=None, profile=None, control=None):
+    key = crf_key(use_gpu, record.ext, profile)
+    try:
+        cache = AnalysisCache()
+    except Exception:
+        cache = None
+    try:
+        crf = cache.get_crf(record, key) if cache else None
+        if crf is None:
+            crf = search_crf(record.path, probe, use_gpu, threads, profile, control)
+            if crf is not None and cache:
+                cache.put_crf(record, key, crf)
+        return crf
+    finally:
+        if cache:
+            cache.close()
+
+def compress(src, dst, use_gpu=False, progress_callback=None, control=None, threads=None, probe=None, profile=None,
+             record=None):
+    try:
+        if record is None:
+            if not os.path.isfile(src):
+                raise FileNotFoundError(f"Source vidéo introuvable: {src}")
+            st = os.stat(src)
+            ext = os.path.splitext(src)[1].lower()
+            record = FileRecord(src, st.st_size, st.st_mtime, ext, os.path.basename(src))
+
+        ext_lower = os.path.splitext(src)[1].lower()
+        crf = config.VIDEO_CRF
+
+        ffmpeg, env = _ffmpeg_env()
+
+        final_codec, use_nvenc = select_encoder(ext_lower, use_gpu, profile)
+
+        if probe is None:
+            probe = probe_path(src)
+        total_duration = (probe or {}).get("duration") or 0.0
+        # Fallback encoders reuse the job's threads: the scheduler reserved
+        # cpu slots for this job only.
+        threads = threads or thread_budget(probe, use_nvenc, final_codec, profile)
+
+        source_size = record.size
+        filters, rules = cap_filters(probe)
+        action, reason = decide(probe, source_size)
+        bitrate = None
+        if action == "encode" and config.VIDEO_MODE == "size":
+            bitrate = target_bitrate(probe, ext_lower, source_size)
+            if bitrate is None:
+                raise RuntimeError("Durée inconnue, impossible de viser une taille")
+            reason = f"target {target_size(source_size)} B, {bitrate // 1000} kb/s"
+        elif action == "encode" and config.VIDEO_QUALITY_SEARCH:
+            searched = find_crf(record, probe, use_gpu, threads, profile, control)
+            check_cancelled(control)
+            if searched == CRF_MISSED:
+                reason = (
+                    f"{reason}, {config.VIDEO_QUALITY_METRIC} < {quality_target()} at crf {CRF_SEARCH_MIN}, "
+                    f"keeping crf {crf}"
+                )
+            elif searched is not None:
+                crf = searched
+                reason = f"{reason}, crf {crf} for {config.VIDEO_QUALITY_METRIC} >= {quality_target()}"
+        if action == "copy":
+            copy_file(src, dst, control)
+        elif action == "remux":
+            returncode = _run_ffmpeg([ffmpeg, "-y", "-i", src, "-map", "0", "-c", "copy", dst], env, control=control)
+            if returncode != 0 or not os.path.isfile(dst):
+                raise RuntimeError(f"FFmpeg a échoué (code {returncode}) lors du remux")
+        elif is_segmented(probe, use_nvenc):
+            streams = stream_args(probe, ext_lower, source=1, video_map="0:v:0")
+            _compress_segments(
+                ffmpeg, env, src, dst, final_codec, crf, threads, streams, total_duration, progress_callback, control,
+                filters,
+            )
+            if not os.path.isfile(dst):
+                raise RuntimeError("FFmpeg n'a pas créé la sortie")
+        else:
+            chain = encoder_chain(ext_lower, use_gpu, profile)
+            projected, used_codec = _encode_with_failover(
+                ffmpeg, env, src, dst, source_size, chain, crf, threads,
+                stream_args(probe, ext_lower), total_duration, progress_callback, control, bitrate, filters,
+            )
+            if used_codec != chain[0]:
+                reason = f"{reason}, fallback to {used_codec}"
+            if projected is not None:
+                copy_file(src, dst, control)
+                action, reason = "copy", f"encode aborted, projected {projected} B > source {source_size} B"
+
+        if action in ("encode", "remux") and os.path.getsize(dst) >= source_size:
+            copy_file(src, dst, control)
+            action, reason = "copy", f"{action} output not smaller than source"
+        if profile and action == "encode":
+            reason = f"{reason}, profile {profile}"
+
         if progress_callback:
             progress_callback(100)
-        return True
+        return {"action": action, "reason": reason, "caps": ", ".join(rules) if action == "encode" else ""}
 
-    except Exception:
+    except Exception as e:
         try:
             if os.path.isfile(dst):
                 os.remove(dst)
         except OSError:
             pass
+        if is_cancelled(control):
+            raise Cancelled("Compression annulée") from e
         if progress_callback:
             progress_callback(100)
         return False
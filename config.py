@@ -8,7 +8,20 @@ DEFAULT_SETTINGS = {
     "VIDEO_CRF": 28,
     "LANG": "en",
     "LOG_COLOR": True,
-    "THEME": "light"
+    "THEME": "light",
+    "ESTIMATION_MODE": "ratio",
+    "DISPATCH_BACKEND": "thread",
+    "VIDEO_MODE": "crf",
+    "VIDEO_TARGET_PERCENT": 50,
+    "VIDEO_TARGET_MB": 0,
+    "VIDEO_TRIAL_ENCODES": False,
+    "VIDEO_QUALITY_SEARCH": False,
+    "VIDEO_QUALITY_METRIC": "ssim",
+    "VIDEO_QUALITY_TARGET": 0,
+    "VIDEO_MAX_HEIGHT": 0,
+    "VIDEO_MAX_FPS": 0,
+    "VIDEO_PROFILE": "balanced",
+    "VIDEO_TIME_BUDGET_HOURS": 0
 }
 
 SETTINGS_FILE = settings_path()
@@ -32,9 +45,25 @@ VIDEO_CRF     = int(settings.get("VIDEO_CRF", DEFAULT_SETTINGS["VIDEO_CRF"]))
 LANG          = str(settings.get("LANG", DEFAULT_SETTINGS["LANG"]))
 LOG_COLOR     = bool(settings.get("LOG_COLOR", DEFAULT_SETTINGS["LOG_COLOR"]))
 THEME         = str(settings.get("THEME", DEFAULT_SETTINGS["THEME"]))
+ESTIMATION_MODE = str(settings.get("ESTIMATION_MODE", DEFAULT_SETTINGS["ESTIMATION_MODE"]))
+DISPATCH_BACKEND = str(settings.get("DISPATCH_BACKEND", DEFAULT_SETTINGS["DISPATCH_BACKEND"]))
+VIDEO_MODE = str(settings.get("VIDEO_MODE", DEFAULT_SETTINGS["VIDEO_MODE"]))
+VIDEO_TARGET_PERCENT = int(settings.get("VIDEO_TARGET_PERCENT", DEFAULT_SETTINGS["VIDEO_TARGET_PERCENT"]))
+VIDEO_TARGET_MB = int(settings.get("VIDEO_TARGET_MB", DEFAULT_SETTINGS["VIDEO_TARGET_MB"]))
+VIDEO_TRIAL_ENCODES = bool(settings.get("VIDEO_TRIAL_ENCODES", DEFAULT_SETTINGS["VIDEO_TRIAL_ENCODES"]))
+VIDEO_QUALITY_SEARCH = bool(settings.get("VIDEO_QUALITY_SEARCH", DEFAULT_SETTINGS["VIDEO_QUALITY_SEARCH"]))
+VIDEO_QUALITY_METRIC = str(settings.get("VIDEO_QUALITY_METRIC", DEFAULT_SETTINGS["VIDEO_QUALITY_METRIC"]))
+VIDEO_QUALITY_TARGET = float(settings.get("VIDEO_QUALITY_TARGET", DEFAULT_SETTINGS["VIDEO_QUALITY_TARGET"]))
+VIDEO_MAX_HEIGHT = int(settings.get("VIDEO_MAX_HEIGHT", DEFAULT_SETTINGS["VIDEO_MAX_HEIGHT"]))
+VIDEO_MAX_FPS = int(settings.get("VIDEO_MAX_FPS", DEFAULT_SETTINGS["VIDEO_MAX_FPS"]))
+VIDEO_PROFILE = str(settings.get("VIDEO_PROFILE", DEFAULT_SETTINGS["VIDEO_PROFILE"]))
+VIDEO_TIME_BUDGET_HOURS = float(settings.get("VIDEO_TIME_BUDGET_HOURS", DEFAULT_SETTINGS["VIDEO_TIME_BUDGET_HOURS"]))
 
 IMAGE_QUALITY = max(10, min(100, IMAGE_QUALITY))
 VIDEO_CRF     = max(0,  min(51,  VIDEO_CRF))
+VIDEO_TARGET_PERCENT = max(5, min(95, VIDEO_TARGET_PERCENT))
+VIDEO_TARGET_MB = max(0, VIDEO_TARGET_MB)
+VIDEO_TIME_BUDGET_HOURS = max(0.0, VIDEO_TIME_BUDGET_HOURS)
 
 SUPPORTED_IMAGE = (".jpg", ".jpeg", ".png", ".webp")
 SUPPORTED_VIDEO = (".mp4", ".mkv", ".avi", ".mov", ".wmv", ".flv", ".webm", ".m4v", ".3gp", ".ts", ".mts", ".m2ts", ".vob", ".ogv")
@@ -43,18 +72,109 @@ SUPPORTED_PDF   = (".pdf",)
 
 MAX_WORKERS = os.cpu_count()
 
+ANALYSIS_CACHE_MAX_AGE_DAYS = 30
+
+ESTIMATION_MODES = ("ratio", "sample")
+ESTIMATION_TIME_BUDGET = 2.0
+
+DISPATCH_BACKENDS = ("thread", "process")
+VIDEO_MODES = ("crf", "size")
+QUALITY_TARGETS = {"ssim": 0.97, "psnr": 40.0}
+MAX_HEIGHTS = (0, 2160, 1440, 1080, 720, 480)
+MAX_FPS = (0, 60, 30, 25, 24)
+
+# Software encoder profiles, from fastest to smallest output. Each lists the
+# encoders it can use by preference; crf_offset maps VIDEO_CRF (x265 scale)
+# to the encoder's own scale, size_factor and cost_factor are the output size
+# and encode time relative to "balanced", max_threads caps the thread budget.
+ENCODER_PROFILES = {
+    "fast-archive": (
+        {"codec": "libx264", "preset": "veryfast", "tune": "", "params": "", "crf_offset": -5,
+         "max_threads": 16, "size_factor": 1.6, "cost_factor": 0.2},
+    ),
+    "balanced": (
+        {"codec": "libx265", "preset": "medium", "tune": "",
+         "params": "rc-lookahead=20:b-intra=0:aq-mode=2:psy-rd=1.0:sao=0", "crf_offset": 0,
+         "max_threads": 8, "size_factor": 1.0, "cost_factor": 1.0},
+    ),
+    "max-size": (
+        {"codec": "libsvtav1", "preset": "6", "tune": "", "params": "tune=0", "crf_offset": 6,
+         "max_threads": 16, "size_factor": 0.8, "cost_factor": 1.5},
+        {"codec": "libaom-av1", "preset": "4", "tune": "", "params": "", "crf_offset": 6,
+         "max_threads": 8, "size_factor": 0.75, "cost_factor": 6.0},
+    ),
+}
+
+SEGMENT_MIN_DURATION = 30 * 60
+SEGMENT_SECONDS = 120
+
+TRIAL_CLIPS = 3
+TRIAL_CLIP_SECONDS = 4
+TRIAL_TIME_BUDGET = 300
+
+CALIBRATION_SECONDS = 4
+CALIBRATION_MAX_AGE_DAYS = 30
+
+if ESTIMATION_MODE not in ESTIMATION_MODES:
+    ESTIMATION_MODE = DEFAULT_SETTINGS["ESTIMATION_MODE"]
+if DISPATCH_BACKEND not in DISPATCH_BACKENDS:
+    DISPATCH_BACKEND = DEFAULT_SETTINGS["DISPATCH_BACKEND"]
+if VIDEO_MODE not in VIDEO_MODES:
+    VIDEO_MODE = DEFAULT_SETTINGS["VIDEO_MODE"]
+if VIDEO_QUALITY_METRIC not in QUALITY_TARGETS:
+    VIDEO_QUALITY_METRIC = DEFAULT_SETTINGS["VIDEO_QUALITY_METRIC"]
+if VIDEO_MAX_HEIGHT not in MAX_HEIGHTS:
+    VIDEO_MAX_HEIGHT = DEFAULT_SETTINGS["VIDEO_MAX_HEIGHT"]
+if VIDEO_MAX_FPS not in MAX_FPS:
+    VIDEO_MAX_FPS = DEFAULT_SETTINGS["VIDEO_MAX_FPS"]
+if VIDEO_PROFILE not in ENCODER_PROFILES:
+    VIDEO_PROFILE = DEFAULT_SETTINGS["VIDEO_PROFILE"]
+
 VERSION = "1.3"
 PROJECT_START_YEAR = 2026
 CURRENT_YEAR = datetime.now().year
 COPYRIGHT_YEAR = str(CURRENT_YEAR) if PROJECT_START_YEAR == CURRENT_YEAR else f"{PROJECT_START_YEAR}-{CURRENT_YEAR}"
 
 def reload_settings():
-    global IMAGE_QUALITY, VIDEO_CRF, LANG, LOG_COLOR, THEME
+    global IMAGE_QUALITY, VIDEO_CRF, LANG, LOG_COLOR, THEME, ESTIMATION_MODE, DISPATCH_BACKEND
+    global VIDEO_MODE, VIDEO_TARGET_PERCENT, VIDEO_TARGET_MB, VIDEO_TRIAL_ENCODES
+    global VIDEO_QUALITY_SEARCH, VIDEO_QUALITY_METRIC, VIDEO_QUALITY_TARGET, VIDEO_MAX_HEIGHT, VIDEO_MAX_FPS
+    global VIDEO_PROFILE, VIDEO_TIME_BUDGET_HOURS
     data = _load_settings()
     IMAGE_QUALITY = int(data.get("IMAGE_QUALITY", DEFAULT_SETTINGS["IMAGE_QUALITY"]))
     VIDEO_CRF     = int(data.get("VIDEO_CRF", DEFAULT_SETTINGS["VIDEO_CRF"]))
     LANG          = str(data.get("LANG", DEFAULT_SETTINGS["LANG"]))
     LOG_COLOR     = bool(data.get("LOG_COLOR", DEFAULT_SETTINGS["LOG_COLOR"]))
     THEME         = str(data.get("THEME", DEFAULT_SETTINGS["THEME"]))
+    ESTIMATION_MODE = str(data.get("ESTIMATION_MODE", DEFAULT_SETTINGS["ESTIMATION_MODE"]))
+    DISPATCH_BACKEND = str(data.get("DISPATCH_BACKEND", DEFAULT_SETTINGS["DISPATCH_BACKEND"]))
+    VIDEO_MODE = str(data.get("VIDEO_MODE", DEFAULT_SETTINGS["VIDEO_MODE"]))
+    VIDEO_TARGET_PERCENT = int(data.get("VIDEO_TARGET_PERCENT", DEFAULT_SETTINGS["VIDEO_TARGET_PERCENT"]))
+    VIDEO_TARGET_MB = int(data.get("VIDEO_TARGET_MB", DEFAULT_SETTINGS["VIDEO_TARGET_MB"]))
+    VIDEO_TRIAL_ENCODES = bool(data.get("VIDEO_TRIAL_ENCODES", DEFAULT_SETTINGS["VIDEO_TRIAL_ENCODES"]))
+    VIDEO_QUALITY_SEARCH = bool(data.get("VIDEO_QUALITY_SEARCH", DEFAULT_SETTINGS["VIDEO_QUALITY_SEARCH"]))
+    VIDEO_QUALITY_METRIC = str(data.get("VIDEO_QUALITY_METRIC", DEFAULT_SETTINGS["VIDEO_QUALITY_METRIC"]))
+    VIDEO_QUALITY_TARGET = float(data.get("VIDEO_QUALITY_TARGET", DEFAULT_SETTINGS["VIDEO_QUALITY_TARGET"]))
+    VIDEO_MAX_HEIGHT = int(data.get("VIDEO_MAX_HEIGHT", DEFAULT_SETTINGS["VIDEO_MAX_HEIGHT"]))
+    VIDEO_MAX_FPS = int(data.get("VIDEO_MAX_FPS", DEFAULT_SETTINGS["VIDEO_MAX_FPS"]))
+    VIDEO_PROFILE = str(data.get("VIDEO_PROFILE", DEFAULT_SETTINGS["VIDEO_PROFILE"]))
+    VIDEO_TIME_BUDGET_HOURS = float(data.get("VIDEO_TIME_BUDGET_HOURS", DEFAULT_SETTINGS["VIDEO_TIME_BUDGET_HOURS"]))
     IMAGE_QUALITY = max(10, min(100, IMAGE_QUALITY))
     VIDEO_CRF     = max(0,  min(51,  VIDEO_CRF))
+    VIDEO_TARGET_PERCENT = max(5, min(95, VIDEO_TARGET_PERCENT))
+    VIDEO_TARGET_MB = max(0, VIDEO_TARGET_MB)
+    VIDEO_TIME_BUDGET_HOURS = max(0.0, VIDEO_TIME_BUDGET_HOURS)
+    if ESTIMATION_MODE not in ESTIMATION_MODES:
+        ESTIMATION_MODE = DEFAULT_SETTINGS["ESTIMATION_MODE"]
+    if DISPATCH_BACKEND not in DISPATCH_BACKENDS:
+        DISPATCH_BACKEND = DEFAULT_SETTINGS["DISPATCH_BACKEND"]
+    if VIDEO_MODE not in VIDEO_MODES:
+        VIDEO_MODE = DEFAULT_SETTINGS["VIDEO_MODE"]
+    if VIDEO_QUALITY_METRIC not in QUALITY_TARGETS:
+        VIDEO_QUALITY_METRIC = DEFAULT_SETTINGS["VIDEO_QUALITY_METRIC"]
+    if VIDEO_MAX_HEIGHT not in MAX_HEIGHTS:
+        VIDEO_MAX_HEIGHT = DEFAULT_SETTINGS["VIDEO_MAX_HEIGHT"]
+    if VIDEO_MAX_FPS not in MAX_FPS:
+        VIDEO_MAX_FPS = DEFAULT_SETTINGS["VIDEO_MAX_FPS"]
+    if VIDEO_PROFILE not in ENCODER_PROFILES:
+        VIDEO_PROFILE = DEFAULT_SETTINGS["VIDEO_PROFILE"]
@@ -1,6 +1,28 @@
 import os
-from concurrent.futures import ThreadPoolExecutor
+import time
+import logging
+import threading
+from functools import partial
+import config
 from config import SUPPORTED_IMAGE, SUPPORTED_VIDEO, SUPPORTED_TEXT, SUPPORTED_PDF
+from utils.cancel import Cancelled, check_cancelled
+from utils.files import copy_file, make_output_dirs, part_path
+from manifest import Manifest
+from analysis_cache import AnalysisCache
+from capabilities import reset_failures
+from calibration import plan_time_budget
+from ratio_model import get_model
+from probe import probe_many
+from process_backend import PROCESS_EXTENSIONS, ProcessBackend
+from scheduler import (
+    Job,
+    Scheduler,
+    job_options,
+    job_resources,
+    order_by_cost,
+    predict_cost,
+    predict_makespan,
+)
 from compressors import (
     image_compressor,
     video_compressor,
@@ -8,16 +30,49 @@ from compressors import (
     text_compressor
 )
 
-IMAGE_WORKERS = min(8, os.cpu_count() or 4)
+_scheduler = Scheduler()
+_process_backend = None
+_backend_lock = threading.Lock()
+
+def get_process_backend():
+    global _process_backend
+    if config.DISPATCH_BACKEND != "process":
+        return None
+    with _backend_lock:
+        if _process_backend is None:
+            _process_backend = ProcessBackend()
+        return _process_backend
+
+def close_process_backend():
+    global _process_backend
+    with _backend_lock:
+        backend, _process_backend = _process_backend, None
+    if backend is not None:
+        backend.close()
+
+def dispatch_task(task):
+    backend = get_process_backend()
+    if backend is not None and task[2].lower() in PROCESS_EXTENSIONS:
+        return backend.dispatch(task)
+    return dispatch(task)
 
-VIDEO_PARALLEL_THRESHOLD = 10 * 1024 * 1024
+def _remove_part(dst):
+    try:
+        os.remove(part_path(dst))
+    except OSError:
+        pass
 
 def dispatch(task):
     success = False
+    compressed_size = None
+    details = {}
     media = task[2].lower() in SUPPORTED_IMAGE + SUPPORTED_VIDEO
     try:
         control = None
-        if len(task) == 6:
+        options = {}
+        if len(task) == 7:
+            src, dst, ext, use_gpu, progress_callback, control, options = task
+        elif len(task) == 6:
             src, dst, ext, use_gpu, progress_callback, control = task
         elif len(task) == 5:
             src, dst, ext, use_gpu, progress_callback = task
@@ -25,73 +80,131 @@ def dispatch(task):
             src, dst, ext, use_gpu = task
             progress_callback = None
 
-        os.makedirs(os.path.dirname(dst), exist_ok=True)
         ext_lower = ext.lower()
+        check_cancelled(control)
+        part = part_path(dst)
 
         if ext_lower in SUPPORTED_IMAGE:
-            result = image_compressor.compress(src, dst, use_gpu=use_gpu, progress_callback=progress_callback)
+            result = image_compressor.compress(
+                src, part, use_gpu=use_gpu, progress_callback=progress_callback, control=control,
+            )
         elif ext_lower in SUPPORTED_VIDEO:
             result = video_compressor.compress(
                 src,
-                dst,
+                part,
                 use_gpu=use_gpu,
                 progress_callback=progress_callback,
                 control=control,
+                **options,
             )
         elif ext_lower in SUPPORTED_TEXT:
-            result = text_compressor.compress(src, dst, progress_callback=progress_callback)
+            result = text_compressor.compress(src, part, progress_callback=progress_callback, control=control)
         elif ext_lower in SUPPORTED_PDF:
-            result = pdf_compressor.compress(src, dst, progress_callback=progress_callback)
+            result = pdf_compressor.compress(src, part, progress_callback=progress_callback, control=control)
         else:
             result = False
 
-        success = result is not False and os.path.isfile(dst)
-        if not success:
+        if result is False:
             raise OSError(f"La sortie n'a pas été créée: {dst}")
+        if isinstance(result, dict):
+            details = result
+        os.replace(part, dst)
+        compressed_size = os.path.getsize(dst)
+        success = True
 
+    except Cancelled:
+        details = {"cancelled": True}
     except Exception:
         if not media:
             try:
-                import shutil
-                shutil.copy2(task[0], task[1])
-                success = os.path.isfile(task[1])
+                copy_file(task[0], part_path(task[1]), control)
+                os.replace(part_path(task[1]), task[1])
+                compressed_size = os.path.getsize(task[1])
+                success = True
+            except Cancelled:
+                details = {"cancelled": True}
             except Exception:
                 pass
-    return task[0], task[1], success
-
-def run(tasks):
-    pdf_tasks = []
-    text_tasks = []
-    image_tasks = []
-    video_small_tasks = []
-    video_large_tasks = []
-
-    for task in tasks:
-        ext = task[2].lower()
-        if ext in SUPPORTED_PDF:
-            pdf_tasks.append(task)
-        elif ext in SUPPORTED_TEXT:
-            text_tasks.append(task)
-        elif ext in SUPPORTED_IMAGE:
-            image_tasks.append(task)
-        elif ext in SUPPORTED_VIDEO:
-            size = os.path.getsize(task[0])
-            if size <= VIDEO_PARALLEL_THRESHOLD:
-                video_small_tasks.append(task)
-            else:
-                video_large_tasks.append(task)
-
-    for task in pdf_tasks:
-        dispatch(task)
-
-    for task in text_tasks:
-        dispatch(task)
-
-    with ThreadPoolExecutor(max_workers=IMAGE_WORKERS) as executor:
-        list(executor.map(dispatch, image_tasks))
-
-    for task in video_small_tasks:
-        dispatch(task)
-
-    for task in video_large_tasks:
-        dispatch(task)
+    finally:
+        _remove_part(task[1])
+    return task[0], task[1], success, compressed_size, details
+
+# Takes the whole scan: jobs are ordered by predicted cost and the time budget
+# is planned over every video, so compression starts once the scan is done.
+def run(records, output_root, use_gpu, control=None):
+    manifest = Manifest(output_root)
+    records, _ = manifest.split(records)
+    make_output_dirs(records, output_root)
+    model = get_model()
+    reset_failures()
+
+    def run_task(record):
+        started = time.monotonic()
+        task = (
+            record.path,
+            os.path.join(output_root, record.relative),
+            record.ext,
+            use_gpu,
+            None,
+            control,
+            job_options(record, use_gpu, probes.get(record.path), planner),
+        )
+        try:
+            result = dispatch_task(task)
+        finally:
+            if planner:
+                planner.done(record)
+        if result[2]:
+            manifest.update(record, result[3])
+            if model:
+                model.record(record, result[3], time.monotonic() - started, probes.get(record.path))
+        return result
+
+    backend = get_process_backend()
+    if backend is not None:
+        backend.reset()
+    try:
+        cache = AnalysisCache()
+    except Exception as exc:
+        logging.warning(f"Analysis cache unavailable: {exc}")
+        cache = None
+    try:
+        probes = probe_many(records, cache=cache)
+    finally:
+        if cache:
+            cache.close()
+    planner = plan_time_budget(records, probes, use_gpu)
+    if planner:
+        logging.info(f"Time budget: {config.VIDEO_TIME_BUDGET_HOURS} h, calibrated rates={planner.rates}")
+
+    def make_job(record):
+        probe = probes.get(record.path)
+        return Job(
+            record,
+            job_resources(record, use_gpu, probe, planner),
+            partial(run_task, record),
+            predict_cost(record, probe, use_gpu),
+        )
+
+    jobs = order_by_cost(make_job(record) for record in records)
+    predicted_makespan = predict_makespan(jobs)
+    started = time.monotonic()
+    results = []
+    try:
+        for _, future in _scheduler.run(jobs, control):
+            results.append(future.result())
+    finally:
+        manifest.save()
+        if model:
+            model.save()
+            model.fit()
+        logging.info(
+            f"Run finished: files={len(results)} "
+            f"predicted_makespan={predicted_makespan:.1f}s "
+            f"actual_makespan={time.monotonic() - started:.1f}s"
+        )
+        stop_latency = control.stop_latency() if control is not None else None
+        if stop_latency is not None:
+            logging.info(f"Stop latency: {stop_latency:.3f}s")
+
+    return results
@@ -1,5 +1,25 @@
-import os
-from config import SUPPORTED_VIDEO
+import io
+import time
+from functools import lru_cache
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from PIL import Image
+import config
+from probe import probe_media
+from ratio_model import get_model
+from manifest import settings_hash
+from compressors.video_compressor import (
+    decide,
+    encoder_settings,
+    output_audio_rate,
+    output_pixel_rate,
+    select_encoder,
+    target_bpp,
+    target_size,
+    trial_encode,
+)
+from gpu import has_nvenc
+from scheduler import CompressionControl
+from config import SUPPORTED_IMAGE, SUPPORTED_VIDEO, SUPPORTED_TEXT
 
 RATIOS = {
     ".jpg": 0.6, ".jpeg": 0.6,
@@ -8,11 +28,192 @@ RATIOS = {
     ".txt": 0.2, ".json": 0.2, ".csv": 0.2
 }
 
-def estimate_size(path: str) -> int:
-    size = os.path.getsize(path)
-    ext = os.path.splitext(path)[1].lower()
+SAMPLE_IMAGE_EDGE = 512
+SAMPLE_TEXT_BLOCK = 64 * 1024
+SAMPLE_TEXT_BLOCKS = 4
+# How often queued estimates are checked for having started, so that their
+# time budget counts from the start of the work rather than from submission.
+START_POLL_SECONDS = 0.2
 
-    if ext in SUPPORTED_VIDEO:
-        return int(size * 0.4)
 
-    return int(size * RATIOS.get(ext, 1.0))
+def estimate_size(record, probe=None) -> int:
+    if record.ext in SUPPORTED_VIDEO:
+        if decide(probe, record.size)[0] != "encode":
+            return record.size
+        if config.VIDEO_MODE == "size":
+            return target_size(record.size)
+    model = get_model()
+    ratio = model.ratio(record, probe) if model else None
+    if ratio is not None:
+        return int(record.size * ratio)
+
+    if record.ext in SUPPORTED_VIDEO:
+        return int(record.size * 0.4)
+
+    return int(record.size * RATIOS.get(record.ext, 1.0))
+
+def estimate_key() -> str:
+    trial = f":trial:{settings_hash('.mp4')}" if config.VIDEO_TRIAL_ENCODES else ""
+    if config.ESTIMATION_MODE == "sample":
+        return f"sample:{config.IMAGE_QUALITY}:{settings_hash('.mp4')}{trial}"
+    model = get_model()
+    return f"ratio:{model.version if model else 0}{trial}"
+
+@lru_cache(maxsize=1)
+def _use_gpu() -> bool:
+    return has_nvenc()
+
+def wants_trial(record) -> bool:
+    return config.VIDEO_TRIAL_ENCODES and record.ext in SUPPORTED_VIDEO
+
+def _sample_image(record) -> int:
+    with Image.open(record.path) as img:
+        width, height = img.size
+        img.draft("RGB", (SAMPLE_IMAGE_EDGE, SAMPLE_IMAGE_EDGE))
+        img.thumbnail((SAMPLE_IMAGE_EDGE, SAMPLE_IMAGE_EDGE))
+        sample = img
+
+        if sample.mode == "P" and "transparency" in sample.info:
+            sample = sample.convert("RGBA")
+        if sample.mode in ("RGBA", "LA"):
+            sample = sample.convert("RGB")
+
+        buffer = io.BytesIO()
+        if record.ext == ".webp":
+            sample.save(buffer, format="WEBP", quality=config.IMAGE_QUALITY, method=6)
+        elif record.ext == ".png":
+            sample.save(buffer, format="PNG", optimize=True)
+        else:
+            if sample.mode not in ("RGB", "L", "CMYK"):
+                sample = sample.convert("RGB")
+            sample.save(buffer, format="JPEG", optimize=True, quality=config.IMAGE_QUALITY)
+        sample_pixels = sample.width * sample.height
+
+    if not sample_pixels:
+        return estimate_size(record)
+    estimated = buffer.tell() * (width * height) / sample_pixels
+    return min(record.size, int(estimated))
+
+def _sample_text(record) -> int:
+    if record.size <= SAMPLE_TEXT_BLOCK * SAMPLE_TEXT_BLOCKS:
+        offsets = [0]
+        block = record.size
+    else:
+        step = (record.size - SAMPLE_TEXT_BLOCK) // (SAMPLE_TEXT_BLOCKS - 1)
+        offsets = [i * step for i in range(SAMPLE_TEXT_BLOCKS)]
+        block = SAMPLE_TEXT_BLOCK
+
+    sampled = 0
+    kept = 0
+    with open(record.path, "rb") as f:
+        for offset in offsets:
+            f.seek(offset)
+            data = f.read(block)
+            if offset:
+                data = data[data.find(b"\n") + 1:]
+            if offset + block < record.size:
+                data = data[:data.rfind(b"\n") + 1]
+            try:
+                lines = data.decode("utf-8").splitlines()
+            except UnicodeDecodeError:
+                return record.size
+            stripped = [line.strip() for line in lines if line.strip()]
+            sampled += len(data)
+            kept += len("\n".join(stripped).encode("utf-8"))
+
+    if not sampled:
+        return record.size
+    return min(record.size, int(record.size * kept / sampled))
+
+def _predict_video(record, info) -> int:
+    if not info or not info["duration"] or not info["video"]:
+        return estimate_size(record, info)
+
+    video = info["video"]
+    if decide(info, record.size)[0] != "encode":
+        return record.size
+    if config.VIDEO_MODE == "size":
+        return target_size(record.size)
+    bpp = target_bpp() * encoder_settings(select_encoder(record.ext, _use_gpu())[0])["size_factor"]
+    video_rate = bpp * output_pixel_rate(info)
+    if video["bit_rate"]:
+        video_rate = min(video_rate, video["bit_rate"])
+    audio_rate = output_audio_rate(info, record.ext)
+    return int((video_rate + audio_rate) * info["duration"] / 8)
+
+def sample_size(record, probe=None) -> int:
+    if record.ext in SUPPORTED_IMAGE:
+        return _sample_image(record)
+    if record.ext in SUPPORTED_TEXT:
+        return _sample_text(record)
+    if record.ext in SUPPORTED_VIDEO:
+        return _predict_video(record, probe)
+    return estimate_size(record, probe)
+
+def analyse_file(record, budget=None, probe=None, control=None):
+    if budget is None:
+        budget = config.ESTIMATION_TIME_BUDGET
+    if probe is None:
+        probe = probe_media(record, timeout=budget)
+    if wants_trial(record):
+        trial = trial_encode(record.path, probe, _use_gpu(), size=record.size, control=control)
+        if trial is not None:
+            return trial["size"], probe, trial["seconds"]
+    if config.ESTIMATION_MODE == "sample":
+        return sample_size(record, probe), probe, None
+    return estimate_size(record, probe), probe, None
+
+def _timed(started, func, *args):
+    started.append(time.monotonic())
+    return func(*args)
+
+def iter_estimates(records, workers=None, budget=None, known_probes=None):
+    workers = workers or config.MAX_WORKERS or 4
+    budget = budget or config.ESTIMATION_TIME_BUDGET
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="estimate")
+    records = iter(records)
+    running = {}
+    known_probes = known_probes if known_probes is not None else {}
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(running) < workers:
+                try:
+                    record = next(records)
+                except StopIteration:
+                    exhausted = True
+                    break
+                probe = known_probes.pop(record.path, None)
+                started = []
+                control = CompressionControl()
+                future = executor.submit(_timed, started, analyse_file, record, budget, probe, control)
+                allowed = budget + (config.TRIAL_TIME_BUDGET if wants_trial(record) else 0)
+                running[future] = (record, started, allowed, control)
+            if not running:
+                break
+
+            now = time.monotonic()
+            waits = [
+                started[0] + allowed - now if started else START_POLL_SECONDS
+                for _, started, allowed, _ in running.values()
+            ]
+            done, _ = wait(running, timeout=max(0.0, min(waits)), return_when=FIRST_COMPLETED)
+            for future in done:
+                record, _, _, _ = running.pop(future)
+                try:
+                    estimated, probe, seconds = future.result()
+                except Exception:
+                    estimated, probe, seconds = estimate_size(record), None, None
+                yield record, estimated, probe, seconds
+
+            now = time.monotonic()
+            for future, (record, started, allowed, control) in list(running.items()):
+                if started and started[0] + allowed <= now:
+                    running.pop(future)
+                    future.cancel()
+                    control.stop()
+                    yield record, estimate_size(record), None, None
+    finally:
+        for *_, control in running.values():
+            control.stop()
+        executor.shutdown(wait=False, cancel_futures=True)
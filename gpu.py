@@ -1,37 +1,7 @@
-import os
-import sys
-import subprocess
-
-from utils.process import hidden_process_kwargs
-
-try:
-    from utils.paths import bundled_path
-except Exception:
-    bundled_path = None
-
-def _ffmpeg_cmd_and_env():
-    env = os.environ.copy()
-
-    if getattr(sys, "frozen", False) and bundled_path is not None:
-        ffmpeg = str(bundled_path("ffmpeg/ffmpeg.exe"))
-        ff_dir = str(bundled_path("ffmpeg"))
-        env["PATH"] = ff_dir + os.pathsep + env.get("PATH", "")
-        return ffmpeg, env
-
-    return "ffmpeg", env
+from capabilities import has_nvenc as _has_nvenc
 
 def has_nvenc() -> bool:
-    ffmpeg, env = _ffmpeg_cmd_and_env()
     try:
-        r = subprocess.run(
-            [ffmpeg, "-encoders"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.DEVNULL,
-            text=True,
-            env=env,
-            **hidden_process_kwargs(),
-        )
-        out = r.stdout or ""
-        return ("h264_nvenc" in out) or ("hevc_nvenc" in out)
+        return _has_nvenc()
     except Exception:
         return False
@@ -7,7 +7,8 @@ import time
 import threading
 import json
 import queue
-from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+from functools import partial
 import config
 from tkinter import (
     Tk,
@@ -17,6 +18,7 @@ from tkinter import (
     Text,
     BooleanVar,
     IntVar,
+    DoubleVar,
     StringVar,
     X,
     Y,
@@ -28,19 +30,42 @@ from tkinter import (
     W,
     END,
     HORIZONTAL,
+    VERTICAL,
+    Canvas,
+    TclError,
 )
 from tkinter import filedialog, ttk
 from tkinterdnd2 import DND_FILES, TkinterDnD
-from scanner import scan_folder
-from estimations import estimate_size
-from dispatcher import dispatch
+from scanner import iter_folder
+from estimations import iter_estimates, estimate_key
+from analysis_cache import AnalysisCache
+from dispatcher import close_process_backend, dispatch_task, get_process_backend
+from manifest import Manifest
+from ratio_model import get_model
+from scheduler import (
+    CompressionControl,
+    Job,
+    Scheduler,
+    job_options,
+    job_resources,
+    order_by_cost,
+    predict_cost,
+    predict_makespan,
+)
 from gpu import has_nvenc
+from capabilities import reset_failures
+from calibration import plan_time_budget
 from utils.paths import settings_path, bundled_path, log_dir
-from config import SUPPORTED_IMAGE, SUPPORTED_VIDEO, SUPPORTED_TEXT, SUPPORTED_PDF
+from config import SUPPORTED_IMAGE, SUPPORTED_VIDEO
 from config import VERSION, COPYRIGHT_YEAR
 from utils.humanize import human
+from utils.files import make_output_dirs
 from setup_check import run_all_checks
 
+FILE_PROGRESS_MIN_SIZE = 10 * 1024 * 1024
+SETTINGS_HEIGHT = 870
+SETTINGS_SCREEN_MARGIN = 80
+
 def configure_dpi_awareness():
     if os.name != "nt":
         return
@@ -79,12 +104,6 @@ def format_duration(seconds: float | None) -> str:
         return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
     return f"{minutes:02d}:{seconds:02d}"
 
-class CompressionControl:
-    def __init__(self):
-        self.stop_event = threading.Event()
-        self.pause_event = threading.Event()
-        self.condition = threading.Condition()
-
 class AppDialog(Toplevel):
     def __init__(self, parent, title: str, message: str, kind: str = "info", ok_text: str = "OK", log_folder: str | None = None):
         super().__init__(parent)
@@ -475,6 +494,8 @@ class App(TkinterDnD.Tk):
         self.src_dir = ""
         self.dst_dir = ""
         self.files_to_process = []
+        self.file_probes = {}
+        self.file_seconds = {}
         self.failed_files = []
         self._analysis_queue = queue.Queue()
         self._analysis_poll_job = None
@@ -489,11 +510,13 @@ class App(TkinterDnD.Tk):
         self._compression_total_bytes = 0
         self._compression_completed_bytes = 0
         self._compression_speed = 0.0
-        self._current_file_size = 0
+        self._compression_predicted_seconds = None
         self._current_file_index = 0
+        self._file_progress = {}
         self._compression_total_files = 0
         self._compression_control = None
         self._compression_paused = False
+        self._scheduler = Scheduler()
 
         self.drop_target_register(DND_FILES)
         self.dnd_bind("<<Drop>>", self.on_drop)
@@ -800,6 +823,11 @@ class App(TkinterDnD.Tk):
 
     def _on_main_close(self):
         log_event("Application closing")
+        control = self._compression_control
+        if control is not None:
+            control.stop()
+        threading.Thread(target=self._scheduler.close, name="scheduler-close", daemon=True).start()
+        threading.Thread(target=close_process_backend, name="backend-close", daemon=True).start()
         self.destroy()
 
     def report_callback_exception(self, exc, val, tb):
@@ -1017,52 +1045,90 @@ class App(TkinterDnD.Tk):
 
     def _analyse_worker(self, source_dir):
         files = []
-        total_original = 0
-        total_estimated = 0
-
+        probes = {}
+        seconds_by_path = {}
+        totals = {"original": 0, "estimated": 0, "cached": 0}
+        key = estimate_key()
+        known_probes = {}
         try:
-            for f in scan_folder(source_dir):
-                ext = os.path.splitext(f)[1].lower()
-                if ext not in SUPPORTED_IMAGE + SUPPORTED_VIDEO + SUPPORTED_TEXT + SUPPORTED_PDF:
-                    continue
+            cache = AnalysisCache()
+        except Exception as exc:
+            log_event(f"Analysis cache unavailable: {exc}")
+            cache = None
 
-                try:
-                    original_size = os.path.getsize(f)
-                    estimated_size = estimate_size(f)
-                except OSError as exc:
-                    self._analysis_queue.put((
-                        "log",
-                        self.t(
-                            "log_analysis_file_error",
-                            path=f,
-                            error=exc,
-                        ),
-                    ))
+        def on_scan_error(path, exc):
+            self._analysis_queue.put((
+                "log",
+                self.t(
+                    "log_analysis_file_error",
+                    path=path,
+                    error=exc,
+                ),
+            ))
+
+        def add(record, estimated_size, probe, seconds=None):
+            files.append(record)
+            if probe is not None:
+                probes[record.path] = probe
+            if seconds is not None:
+                seconds_by_path[record.path] = seconds
+            totals["original"] += record.size
+            totals["estimated"] += estimated_size
+            line = self.t(
+                "log_analyze_line",
+                name=os.path.basename(record.path),
+                original=human(record.size),
+                estimated=human(estimated_size),
+                gain=human(record.size - estimated_size),
+            )
+            if seconds is not None:
+                line += self.t("log_analyze_time", value=format_duration(seconds))
+            self._analysis_queue.put(("log", line))
+
+        def uncached_records():
+            for record in iter_folder(source_dir, on_error=on_scan_error):
+                entry = cache.get(record) if cache else None
+                if entry and entry["estimate"] is not None and entry["estimate_key"] == key:
+                    totals["cached"] += 1
+                    add(record, entry["estimate"], entry["probe"], entry["seconds"])
                     continue
+                if entry and entry["probe"] is not None:
+                    known_probes[record.path] = entry["probe"]
+                yield record
 
-                files.append(f)
-                total_original += original_size
-                total_estimated += estimated_size
+        try:
+            for record, estimated_size, probe, seconds in iter_estimates(
+                uncached_records(),
+                known_probes=known_probes,
+            ):
+                if cache:
+                    cache.put(record, estimated_size, key, probe, seconds)
+                add(record, estimated_size, probe, seconds)
+
+            if totals["cached"]:
                 self._analysis_queue.put((
                     "log",
-                    self.t(
-                        "log_analyze_line",
-                        name=os.path.basename(f),
-                        original=human(original_size),
-                        estimated=human(estimated_size),
-                        gain=human(original_size - estimated_size),
-                    ),
+                    self.t("log_analysis_cached", count=totals["cached"], total=len(files)),
                 ))
-
             self._analysis_queue.put((
                 "done",
                 files,
-                total_original,
-                total_estimated,
+                probes,
+                seconds_by_path,
+                totals["original"],
+                totals["estimated"],
             ))
         except Exception as exc:
             log_event(f"Analyze failed: source={source_dir} error={exc}")
             self._analysis_queue.put(("error", str(exc)))
+        finally:
+            if cache:
+                try:
+                    evicted = cache.evict()
+                    cache.close()
+                    log_event(f"Analysis cache updated: cached={totals['cached']} evicted={evicted}")
+                except Exception as exc:
+                    log_event(f"Analysis cache update failed: {exc}")
 
     def _poll_analysis_queue(self):
         self._analysis_poll_job = None
@@ -1079,14 +1145,24 @@ class App(TkinterDnD.Tk):
             if kind == "log":
                 self.log(event[1])
             elif kind == "done":
-                _, files, total_original, total_estimated = event
+                _, files, probes, seconds_by_path, total_original, total_estimated = event
                 self.files_to_process = files
+                self.file_probes = probes
+                self.file_seconds = seconds_by_path
                 self.total_original = total_original
                 self._analysis_running = False
                 self.log("\n" + self.t("log_separator"))
                 self.log(self.t("log_total_original", value=human(total_original)))
                 self.log(self.t("log_total_estimated", value=human(total_estimated)))
                 self.log(self.t("log_total_gain", value=human(total_original - total_estimated)))
+                if seconds_by_path:
+                    self.log(
+                        self.t(
+                            "log_total_time",
+                            value=format_duration(sum(seconds_by_path.values())),
+                            count=len(seconds_by_path),
+                        )
+                    )
                 self.log(self.t("log_separator") + "\n")
                 log_event(
                     "Analyze finished: "
@@ -1147,40 +1223,27 @@ class App(TkinterDnD.Tk):
         control = self._compression_control
         if control is None:
             return
-        with control.condition:
-            if control.pause_event.is_set():
-                control.pause_event.clear()
-                self._compression_paused = False
-                self.btn_pause_resume.configure(text=self.t("btn_pause"))
-                self.log(self.t("log_resumed"))
-            else:
-                control.pause_event.set()
-                self._compression_paused = True
-                self.btn_pause_resume.configure(text=self.t("btn_resume"))
-                self.log(self.t("log_pause_requested"))
-            control.condition.notify_all()
+        if control.pause_event.is_set():
+            control.resume()
+            self._compression_paused = False
+            self.btn_pause_resume.configure(text=self.t("btn_pause"))
+            self.log(self.t("log_resumed"))
+        else:
+            control.pause()
+            self._compression_paused = True
+            self.btn_pause_resume.configure(text=self.t("btn_resume"))
+            self.log(self.t("log_pause_requested"))
+            log_event(f"Compression paused: suspended_processes={control.suspended()}")
 
     def stop_compression(self):
         control = self._compression_control
         if control is None:
             return
-        control.stop_event.set()
-        with control.condition:
-            control.pause_event.clear()
-            control.condition.notify_all()
+        control.stop()
         self.btn_stop.configure(state="disabled")
         self.btn_pause_resume.configure(state="disabled")
         self.log(self.t("log_stop_requested"))
 
-    def _wait_for_pause(self):
-        control = self._compression_control
-        if control is None:
-            return False
-        with control.condition:
-            while control.pause_event.is_set() and not control.stop_event.is_set():
-                control.condition.wait(timeout=0.2)
-        return control.stop_event.is_set()
-
     def _finish_compression_controls(self):
         self._compression_paused = False
         self._compression_control = None
@@ -1246,6 +1309,15 @@ class App(TkinterDnD.Tk):
             if self._compression_speed > 0
             else None
         )
+        predicted = self._compression_predicted_seconds
+        if predicted is not None and total_bytes:
+            done = processed / total_bytes
+            predicted_remaining = predicted * (1.0 - done)
+            remaining = (
+                remaining * done + predicted_remaining * (1.0 - done)
+                if remaining is not None
+                else predicted_remaining
+            )
         self.progress_eta_label.config(
             text=self.t(
                 "progress_timing",
@@ -1254,22 +1326,39 @@ class App(TkinterDnD.Tk):
             )
         )
 
-    def _update_global_progress(self, current, total, file_percent=100):
+    def _predict_seconds(self, records):
+        model = get_model()
+        known_bytes = 0
+        known_seconds = 0.0
+        for record in records:
+            seconds = self.file_seconds.get(record.path)
+            if seconds is None and model is not None:
+                seconds = model.seconds(record)
+            if seconds is not None:
+                known_bytes += record.size
+                known_seconds += seconds
+        total_bytes = sum(record.size for record in records)
+        if not known_bytes:
+            return None
+        return known_seconds * total_bytes / known_bytes
+
+    def _update_global_progress(self, current, total):
         if threading.current_thread() is not threading.main_thread():
             try:
-                self.after(0, self._update_global_progress, current, total, file_percent)
+                self.after(0, self._update_global_progress, current, total)
             except RuntimeError:
                 pass
             return
 
         if self._compression_total_bytes:
-            processed_bytes = self._compression_completed_bytes + (
-                self._current_file_size * max(0, min(100, file_percent)) / 100
+            processed_bytes = self._compression_completed_bytes + sum(
+                size * max(0, min(100, percent)) / 100
+                for size, percent in self._file_progress.values()
             )
             global_percent = processed_bytes / self._compression_total_bytes * 100
             self._update_eta(processed_bytes)
         else:
-            global_percent = ((current - 1) + file_percent / 100) / total * 100 if total else 100
+            global_percent = current / total * 100 if total else 100
             self._update_eta(0)
         self.progress_global["value"] = global_percent
         self.progress_global_label.config(
@@ -1281,6 +1370,18 @@ class App(TkinterDnD.Tk):
             )
         )
 
+    def _complete_file_progress(self, path, size, current, total):
+        if threading.current_thread() is not threading.main_thread():
+            try:
+                self.after(0, self._complete_file_progress, path, size, current, total)
+            except RuntimeError:
+                pass
+            return
+
+        self._file_progress.pop(path, None)
+        self._compression_completed_bytes += size
+        self._update_global_progress(current, total)
+
     def _prepare_global_progress(self, total):
         if threading.current_thread() is not threading.main_thread():
             try:
@@ -1293,111 +1394,85 @@ class App(TkinterDnD.Tk):
 
     def _compress_file_worker(
         self,
-        path,
+        record,
         use_gpu,
         output_root,
         progress_callback=None,
         control=None,
+        options=None,
     ):
-        relative = os.path.relpath(path, self.src_dir)
-        output = os.path.join(output_root, relative)
-        extension = os.path.splitext(path)[1].lower()
-        try:
-            original_size = os.path.getsize(path)
-        except OSError as exc:
-            return {
-                "path": path,
-                "output": output,
-                "extension": extension,
-                "original_size": None,
-                "compressed_size": None,
-                "status": "source_error",
-                "error": exc,
-            }
-
-        try:
-            os.makedirs(os.path.dirname(output), exist_ok=True)
-        except OSError as exc:
-            return {
-                "path": path,
-                "output": output,
-                "extension": extension,
-                "original_size": original_size,
-                "compressed_size": None,
-                "status": "output_missing",
-                "error": exc,
-                "destination_available": os.path.isdir(output_root),
-            }
+        path = record.path
+        output = os.path.join(output_root, record.relative)
+        extension = record.ext
+        original_size = record.size
+        started = time.monotonic()
 
         try:
-            result = dispatch(
-                (path, output, extension, use_gpu, progress_callback, control)
+            result = dispatch_task(
+                (path, output, extension, use_gpu, progress_callback, control, options or {})
             )
-            success = result[2] if len(result) > 2 else os.path.isfile(output)
+            success = result[2]
+            compressed_size = result[3]
+            details = result[4]
         except Exception as exc:
             success = False
+            details = {}
             error = exc
         else:
             error = None
+        seconds = time.monotonic() - started
 
-        if not success:
+        if not success and details.get("cancelled"):
             return {
                 "path": path,
+                "record": record,
                 "output": output,
                 "extension": extension,
                 "original_size": original_size,
                 "compressed_size": None,
-                "status": "output_missing",
-                "error": error,
-                "destination_available": os.path.isdir(output_root),
+                "status": "cancelled",
+                "error": None,
+                "destination_available": True,
             }
-
-        try:
-            compressed_size = os.path.getsize(output)
-        except OSError as exc:
+        if not success:
             return {
                 "path": path,
+                "record": record,
                 "output": output,
                 "extension": extension,
                 "original_size": original_size,
                 "compressed_size": None,
-                "status": "output_size_error",
-                "error": exc,
+                "status": "output_missing",
+                "error": error,
                 "destination_available": os.path.isdir(output_root),
             }
 
         return {
             "path": path,
+            "record": record,
             "output": output,
             "extension": extension,
             "original_size": original_size,
             "compressed_size": compressed_size,
+            "seconds": seconds,
+            "details": details,
             "status": "success",
             "error": None,
             "destination_available": True,
         }
 
-    def _record_compression_result(self, result, index, total, failed_files):
+    def _record_compression_result(self, result, index, total, failed_files, manifest=None):
         path = result["path"]
         extension = result["extension"]
         original_size = result["original_size"]
         self._current_file_index = index
-        self._current_file_size = original_size or 0
         self._set_file_progress_title(path)
         self.log(self.t("log_compressing", name=os.path.basename(path)))
         log_event(f"Compressing file: {path}")
 
-        if result["status"] == "source_error":
-            self.log(
-                self.t(
-                    "log_source_error",
-                    path=path,
-                    error=result["error"],
-                )
-            )
-            if extension in SUPPORTED_IMAGE + SUPPORTED_VIDEO:
-                failed_files.append(path)
-            self._update_global_progress(index, total)
+        if result["status"] == "cancelled":
+            log_event(f"Compression cancelled: {path}")
+            self._complete_file_progress(path, original_size or 0, index, total)
             return False
 
         if result["status"] == "output_missing":
@@ -1419,26 +1494,21 @@ class App(TkinterDnD.Tk):
                 )
                 log_event(f"Compression stopped: NAS unavailable: {result['output']}")
                 return True
-            self._compression_completed_bytes += original_size or 0
-            self._update_global_progress(index, total)
+            self._complete_file_progress(path, original_size or 0, index, total)
             return False
 
-        if result["status"] == "output_size_error":
-            if extension in SUPPORTED_IMAGE + SUPPORTED_VIDEO:
-                failed_files.append(path)
-            self.log(
-                self.t(
-                    "log_output_error",
-                    name=os.path.basename(path),
-                    error=result["error"],
-                )
-            )
-            log_event(f"Output size unavailable: {result['output']} error={result['error']}")
-            self._compression_completed_bytes += original_size or 0
-            return True
-
         compressed_size = result["compressed_size"]
         self.total_compressed += compressed_size
+        if manifest is not None:
+            manifest.update(result["record"], compressed_size)
+        model = get_model()
+        if model:
+            model.record(
+                result["record"],
+                compressed_size,
+                result["seconds"],
+                self.file_probes.get(result["record"].path),
+            )
         percent_file = (
             (compressed_size / original_size) * 100
             if original_size and original_size > 0
@@ -1452,13 +1522,24 @@ class App(TkinterDnD.Tk):
                 compressed=human(compressed_size),
             )
         )
+        details = result.get("details") or {}
+        if details.get("action") in ("copy", "remux"):
+            self.log(
+                self.t(
+                    f"log_video_{details['action']}",
+                    name=os.path.basename(path),
+                    reason=details.get("reason", ""),
+                )
+            )
+        if details.get("caps"):
+            self.log(self.t("log_video_capped", name=os.path.basename(path), rules=details["caps"]))
         log_event(
             "Compressed file: "
             f"path={path} original={original_size} compressed={compressed_size} "
-            f"percent={percent_file:.1f}"
+            f"percent={percent_file:.1f} "
+            f"action={details.get('action', '')} reason={details.get('reason', '')}"
         )
-        self._compression_completed_bytes += original_size or 0
-        self._update_global_progress(index, total, 100)
+        self._complete_file_progress(path, original_size or 0, index, total)
         return False
 
     def compress_thread(self):
@@ -1470,27 +1551,30 @@ class App(TkinterDnD.Tk):
             log_event("Compress blocked: no destination selected")
             return
 
+        reset_failures()
         use_gpu = has_nvenc()
-        log_event(f"Compression started: files={len(self.files_to_process)} use_gpu={use_gpu}")
-        total_files = len(self.files_to_process)
+        source_folder_name = os.path.basename(os.path.normpath(self.src_dir))
+        output_root = os.path.join(self.dst_dir, source_folder_name)
+        manifest = Manifest(output_root)
+        pending, up_to_date = manifest.split(self.files_to_process)
+        log_event(
+            f"Compression started: files={len(pending)} up_to_date={len(up_to_date)} use_gpu={use_gpu}"
+        )
+        if up_to_date:
+            self.log(self.t("log_up_to_date", count=len(up_to_date)))
+        total_files = len(pending)
         self._compression_started_at = time.monotonic()
         self._compression_total_files = total_files
         self._compression_completed_bytes = 0
         self._compression_speed = 0.0
-        self._current_file_size = 0
         self._current_file_index = 0
-        self._compression_total_bytes = 0
-        for path in self.files_to_process:
-            try:
-                self._compression_total_bytes += os.path.getsize(path)
-            except OSError:
-                continue
-        self.total_compressed = 0
-        source_folder_name = os.path.basename(os.path.normpath(self.src_dir))
-        output_root = os.path.join(self.dst_dir, source_folder_name)
+        self._file_progress = {}
+        self._compression_total_bytes = sum(record.size for record in pending)
+        self._compression_predicted_seconds = self._predict_seconds(pending)
+        self.total_compressed = sum(output_size for _, output_size in up_to_date)
 
         try:
-            os.makedirs(output_root, exist_ok=True)
+            make_output_dirs(pending, output_root)
         except OSError as exc:
             self.log(
                 self.t(
@@ -1504,78 +1588,88 @@ class App(TkinterDnD.Tk):
             self.after(0, self._finish_compression_controls)
             return
 
+        backend = get_process_backend()
+        if backend is not None:
+            backend.reset()
         self._prepare_global_progress(total_files)
         aborted = False
         failed_files = []
 
-        image_files = [
-            (index, path)
-            for index, path in enumerate(self.files_to_process, 1)
-            if os.path.splitext(path)[1].lower() in SUPPORTED_IMAGE
-        ]
-        other_files = [
-            (index, path)
-            for index, path in enumerate(self.files_to_process, 1)
-            if os.path.splitext(path)[1].lower() not in SUPPORTED_IMAGE
-        ]
-        image_workers = 2
-
-        for start in range(0, len(image_files), image_workers):
-            if self._wait_for_pause():
-                aborted = True
-                break
-            batch = image_files[start:start + image_workers]
-            with ThreadPoolExecutor(max_workers=len(batch)) as executor:
-                futures = [
-                    executor.submit(
-                        self._compress_file_worker,
-                        path,
-                        use_gpu,
-                        output_root,
-                        None,
-                        self._compression_control,
-                    )
-                    for _, path in batch
-                ]
-                for (index, _), future in zip(batch, futures):
-                    if self._record_compression_result(
-                        future.result(),
-                        index,
-                        total_files,
-                        failed_files,
-                    ):
-                        aborted = True
-                        break
-            if aborted:
-                break
+        control = self._compression_control
 
-        if not aborted:
-            for index, path in other_files:
-                if self._wait_for_pause():
-                    aborted = True
-                    break
-                extension = os.path.splitext(path)[1].lower()
-                try:
-                    file_size = os.path.getsize(path)
-                except OSError:
-                    file_size = 0
-                callback = self.update_file_progress if file_size > 10 * 1024 * 1024 else None
-                self.after(0, self._prepare_file_progress, callback is not None)
-                result = self._compress_file_worker(
-                    path,
+        planner = None
+        if config.VIDEO_TIME_BUDGET_HOURS > 0:
+            self.log(self.t("log_calibrating"))
+            planner = plan_time_budget(pending, self.file_probes, use_gpu)
+            if planner:
+                rates = ", ".join(f"{profile} {rate / 1e6:.1f} MP/s" for profile, rate in planner.rates.items())
+                self.log(self.t("log_time_budget", hours=config.VIDEO_TIME_BUDGET_HOURS, rates=rates))
+            log_event(f"Time budget planner: hours={config.VIDEO_TIME_BUDGET_HOURS} rates={planner and planner.rates}")
+
+        def run_job(record, callback, probe):
+            try:
+                return self._compress_file_worker(
+                    record,
                     use_gpu,
                     output_root,
                     callback,
-                    self._compression_control,
+                    control,
+                    job_options(record, use_gpu, probe, planner),
                 )
+            finally:
+                if planner:
+                    planner.done(record)
+
+        def make_job(record):
+            callback = (
+                partial(self.update_file_progress, record=record)
+                if self._wants_file_progress(record)
+                else None
+            )
+            probe = self.file_probes.get(record.path)
+            return Job(
+                record,
+                job_resources(record, use_gpu, probe, planner),
+                partial(run_job, record, callback, probe),
+                predict_cost(record, probe, use_gpu),
+            )
+
+        self.after(0, self._prepare_file_progress, any(self._wants_file_progress(r) for r in pending))
+        jobs = order_by_cost(make_job(record) for record in pending)
+        predicted_makespan = predict_makespan(jobs)
+        completed = self._scheduler.run(jobs, control)
+        try:
+            for index, (_, future) in enumerate(completed, 1):
                 if self._record_compression_result(
-                    result,
+                    future.result(),
                     index,
                     total_files,
                     failed_files,
+                    manifest,
                 ):
                     aborted = True
+                    control.stop()
                     break
+        finally:
+            completed.close()
+        aborted = aborted or control.stop_event.is_set()
+        actual_makespan = time.monotonic() - self._compression_started_at
+        stop_latency = control.stop_latency()
+        if stop_latency is not None:
+            self.log(self.t("log_stop_latency", value=f"{stop_latency:.2f}"))
+            log_event(f"Stop latency: {stop_latency:.3f}s")
+
+        try:
+            manifest.save()
+        except OSError as exc:
+            log_event(f"Manifest save failed: {manifest.path} error={exc}")
+        model = get_model()
+        if model:
+            try:
+                model.save()
+                model.fit()
+            except Exception as exc:
+                log_event(f"Ratio model update failed: {exc}")
 
         if not aborted:
             self.log(
@@ -1595,12 +1689,21 @@ class App(TkinterDnD.Tk):
             ("Compression stopped: " if aborted else "Compression finished: ")
             + f"total_original={self.total_original} "
             + f"total_compressed={self.total_compressed} "
+            + f"predicted_makespan={predicted_makespan:.1f}s "
+            + f"actual_makespan={actual_makespan:.1f}s "
             + f"output={os.path.join(self.dst_dir, source_folder_name)}"
         )
         self.log(self.t("log_separator"))
         self.log(self.t("log_total_original", value=human(self.total_original)))
         self.log(self.t("log_total_compressed", value=human(self.total_compressed)))
         self.log(self.t("log_total_gain", value=human(self.total_original - self.total_compressed)))
+        self.log(
+            self.t(
+                "log_makespan",
+                predicted=format_duration(predicted_makespan),
+                actual=format_duration(actual_makespan),
+            )
+        )
         self.log(self.t("log_separator"))
         elapsed = (
             max(0.0, time.monotonic() - self._compression_started_at)
@@ -1625,20 +1728,26 @@ class App(TkinterDnD.Tk):
         self.after(0, self._finish_compression_controls)
         self._compression_started_at = None
 
-    def update_file_progress(self, percent):
+    def _wants_file_progress(self, record):
+        return record.ext not in SUPPORTED_IMAGE and record.size > FILE_PROGRESS_MIN_SIZE
+
+    def update_file_progress(self, percent, record):
         if threading.current_thread() is not threading.main_thread():
             try:
-                self.after(0, self.update_file_progress, percent)
+                self.after(0, self.update_file_progress, percent, record)
             except RuntimeError:
                 pass
             return
 
+        if self._compression_started_at is None:
+            return
+        self._file_progress[record.path] = (record.size, percent)
+        self._set_file_progress_title(record.path)
         self.progress_file["value"] = percent
         self.progress_file_label.config(text=f"{percent:.1f}%")
         self._update_global_progress(
             self._current_file_index,
             self._compression_total_files,
-            percent,
         )
 
     def open_settings_window(self):
@@ -1652,8 +1761,8 @@ class App(TkinterDnD.Tk):
         self._settings_window = win
         log_event("Settings window opened")
         win.title(self.t("settings_title"))
-        win.geometry("320x400")
-        win.resizable(False, False)
+        win.geometry(f"320x{min(SETTINGS_HEIGHT, win.winfo_screenheight() - SETTINGS_SCREEN_MARGIN)}")
+        win.resizable(False, True)
         win.configure(bg=THEME["bg"])
         apply_window_theme(win)
 
@@ -1669,16 +1778,33 @@ class App(TkinterDnD.Tk):
         header_sep = Frame(win, bg=THEME["border"], height=1)
         header_sep.pack(fill=X, pady=(0, 10))
 
-        lbl_img_quality = ttk.Label(win, style="Muted.TLabel")
+        # Save stays pinned below the options, which scroll on short screens.
+        btn_save = ttk.Button(win, width=12, style="Uiverse.Primary.TButton")
+        btn_save.pack(side=BOTTOM, pady=15)
+        body_canvas = Canvas(win, bg=THEME["bg"], highlightthickness=0, bd=0)
+        body_scroll = ttk.Scrollbar(win, orient=VERTICAL, command=body_canvas.yview, style="Vertical.TScrollbar")
+        body_canvas.configure(yscrollcommand=body_scroll.set)
+        body_scroll.pack(side=RIGHT, fill=Y)
+        body_canvas.pack(side=LEFT, fill=BOTH, expand=True)
+        body = Frame(body_canvas, bg=THEME["bg"])
+        body_window = body_canvas.create_window((0, 0), window=body, anchor="nw")
+        body.bind("<Configure>", lambda _e: body_canvas.configure(scrollregion=body_canvas.bbox("all")))
+        body_canvas.bind("<Configure>", lambda e: body_canvas.itemconfigure(body_window, width=e.width))
+        def scroll_body(event):
+            if body.winfo_height() > body_canvas.winfo_height():
+                body_canvas.yview_scroll(int(-event.delta / 120) or (-1 if event.delta > 0 else 1), "units")
+        win.bind("<MouseWheel>", scroll_body)
+
+        lbl_img_quality = ttk.Label(body, style="Muted.TLabel")
         lbl_img_quality.pack(pady=(0, 0))
-        lbl_img_quality_value = ttk.Label(win, style="Muted.TLabel")
+        lbl_img_quality_value = ttk.Label(body, style="Muted.TLabel")
         lbl_img_quality_value.pack(pady=(0, 0))
         img_var = IntVar(value=config.IMAGE_QUALITY)
         img_var.trace_add("write", lambda *_: log_event(f"Image quality changed: {img_var.get()}"))
         def update_img_value(_=None):
             lbl_img_quality_value.config(text=self.t("settings_value", value=img_var.get()))
         ttk.Scale(
-            win,
+            body,
             from_=10,
             to=100,
             orient=HORIZONTAL,
@@ -1687,16 +1813,16 @@ class App(TkinterDnD.Tk):
         ).pack(fill=X, padx=20, pady=(0, 10))
         update_img_value()
 
-        lbl_video_crf = ttk.Label(win, style="Muted.TLabel")
+        lbl_video_crf = ttk.Label(body, style="Muted.TLabel")
         lbl_video_crf.pack(pady=(0, 0))
-        lbl_video_crf_value = ttk.Label(win, style="Muted.TLabel")
+        lbl_video_crf_value = ttk.Label(body, style="Muted.TLabel")
         lbl_video_crf_value.pack(pady=(0, 0))
         crf_var = IntVar(value=config.VIDEO_CRF)
         crf_var.trace_add("write", lambda *_: log_event(f"Video CRF changed: {crf_var.get()}"))
         def update_crf_value(_=None):
             lbl_video_crf_value.config(text=self.t("settings_value", value=crf_var.get()))
         ttk.Scale(
-            win,
+            body,
             from_=0,
             to=51,
             orient=HORIZONTAL,
@@ -1705,40 +1831,215 @@ class App(TkinterDnD.Tk):
         ).pack(fill=X, padx=20)
         update_crf_value()
 
-        lbl_lang = ttk.Label(win, style="Muted.TLabel")
+        lbl_video_profile = ttk.Label(body, style="Muted.TLabel")
+        lbl_video_profile.pack(pady=(10, 0))
+        video_profile_var = StringVar(value=config.VIDEO_PROFILE)
+        ttk.Combobox(
+            body,
+            textvariable=video_profile_var,
+            values=list(config.ENCODER_PROFILES),
+            state="readonly",
+        ).pack(fill=X, padx=20, pady=(0, 4))
+        video_profile_var.trace_add(
+            "write",
+            lambda *_: log_event(f"Video profile changed: {video_profile_var.get()}"),
+        )
+
+        lbl_time_budget = ttk.Label(body, style="Muted.TLabel")
+        lbl_time_budget.pack(pady=(6, 0))
+        time_budget_var = DoubleVar(value=config.VIDEO_TIME_BUDGET_HOURS)
+        ttk.Spinbox(
+            body,
+            from_=0,
+            to=168,
+            increment=0.5,
+            textvariable=time_budget_var,
+        ).pack(fill=X, padx=20, pady=(0, 4))
+
+        lbl_video_mode = ttk.Label(body, style="Muted.TLabel")
+        lbl_video_mode.pack(pady=(10, 0))
+        video_mode_var = StringVar()
+        video_mode_display = {"crf": self.t("video_mode_crf"), "size": self.t("video_mode_size")}
+        display_to_video_mode = {v: k for k, v in video_mode_display.items()}
+        video_mode_var.set(video_mode_display.get(config.VIDEO_MODE, self.t("video_mode_crf")))
+        video_mode_combo = ttk.Combobox(
+            body,
+            textvariable=video_mode_var,
+            values=list(video_mode_display.values()),
+            state="readonly",
+        )
+        video_mode_combo.pack(fill=X, padx=20, pady=(0, 4))
+        video_mode_var.trace_add("write", lambda *_: log_event(f"Video mode changed: {video_mode_var.get()}"))
+
+        lbl_video_target = ttk.Label(body, style="Muted.TLabel")
+        lbl_video_target.pack(pady=(0, 0))
+        lbl_video_target_value = ttk.Label(body, style="Muted.TLabel")
+        lbl_video_target_value.pack(pady=(0, 0))
+        target_percent_var = IntVar(value=config.VIDEO_TARGET_PERCENT)
+        target_percent_var.trace_add(
+            "write",
+            lambda *_: log_event(f"Video target percent changed: {target_percent_var.get()}"),
+        )
+        def update_target_value(_=None):
+            lbl_video_target_value.config(text=self.t("settings_percent_value", value=target_percent_var.get()))
+        ttk.Scale(
+            body,
+            from_=5,
+            to=95,
+            orient=HORIZONTAL,
+            variable=target_percent_var,
+            command=lambda _v: update_target_value()
+        ).pack(fill=X, padx=20)
+        update_target_value()
+
+        lbl_video_target_mb = ttk.Label(body, style="Muted.TLabel")
+        lbl_video_target_mb.pack(pady=(6, 0))
+        target_mb_var = IntVar(value=config.VIDEO_TARGET_MB)
+        ttk.Spinbox(
+            body,
+            from_=0,
+            to=1_000_000,
+            increment=10,
+            textvariable=target_mb_var,
+        ).pack(fill=X, padx=20, pady=(0, 4))
+
+        quality_search_var = BooleanVar(value=config.VIDEO_QUALITY_SEARCH)
+        chk_quality_search = ttk.Checkbutton(body, variable=quality_search_var)
+        chk_quality_search.pack(pady=(6, 0))
+        quality_search_var.trace_add(
+            "write",
+            lambda *_: log_event(f"Quality search toggled: {quality_search_var.get()}"),
+        )
+        quality_metric_var = StringVar(value=config.VIDEO_QUALITY_METRIC.upper())
+        ttk.Combobox(
+            body,
+            textvariable=quality_metric_var,
+            values=[metric.upper() for metric in config.QUALITY_TARGETS],
+            state="readonly",
+        ).pack(fill=X, padx=20, pady=(0, 4))
+        quality_metric_var.trace_add(
+            "write",
+            lambda *_: log_event(f"Quality metric changed: {quality_metric_var.get()}"),
+        )
+
+        lbl_video_caps = ttk.Label(body, style="Muted.TLabel")
+        lbl_video_caps.pack(pady=(6, 0))
+        caps_frame = ttk.Frame(body)
+        caps_frame.pack(fill=X, padx=20, pady=(0, 4))
+        def height_label(value):
+            return f"{value}p" if value else self.t("video_cap_none")
+        def fps_label(value):
+            return f"{value} fps" if value else self.t("video_cap_none")
+        max_height_var = StringVar(value=height_label(config.VIDEO_MAX_HEIGHT))
+        max_height_combo = ttk.Combobox(
+            caps_frame,
+            textvariable=max_height_var,
+            values=[height_label(value) for value in config.MAX_HEIGHTS],
+            state="readonly",
+            width=10,
+        )
+        max_height_combo.pack(side=LEFT, fill=X, expand=True, padx=(0, 4))
+        max_height_var.trace_add("write", lambda *_: log_event(f"Max height changed: {max_height_var.get()}"))
+        max_fps_var = StringVar(value=fps_label(config.VIDEO_MAX_FPS))
+        max_fps_combo = ttk.Combobox(
+            caps_frame,
+            textvariable=max_fps_var,
+            values=[fps_label(value) for value in config.MAX_FPS],
+            state="readonly",
+            width=10,
+        )
+        max_fps_combo.pack(side=LEFT, fill=X, expand=True, padx=(4, 0))
+        max_fps_var.trace_add("write", lambda *_: log_event(f"Max fps changed: {max_fps_var.get()}"))
+        def selected_cap(var, values, label):
+            return next((value for value in values if label(value) == var.get()), 0)
+
+        lbl_lang = ttk.Label(body, style="Muted.TLabel")
         lbl_lang.pack(pady=(10, 0))
         lang_var = StringVar()
         lang_display = {"fr": "Français", "en": "English"}
         display_to_code = {v: k for k, v in lang_display.items()}
         lang_values = list(lang_display.values())
         lang_var.set(lang_display.get(self.lang, "Français"))
-        lang_combo = ttk.Combobox(win, textvariable=lang_var, values=lang_values, state="readonly")
+        lang_combo = ttk.Combobox(body, textvariable=lang_var, values=lang_values, state="readonly")
         lang_combo.pack(fill=X, padx=20, pady=(0, 4))
         lang_var.trace_add("write", lambda *_: log_event(f"Language selection changed: {lang_var.get()}"))
 
-        theme_combo_label = ttk.Label(win, style="Muted.TLabel")
+        theme_combo_label = ttk.Label(body, style="Muted.TLabel")
         theme_combo_label.pack(pady=(6, 0))
         theme_var = StringVar()
         theme_display = {"light": self.t("theme_light"), "dark": self.t("theme_dark")}
         display_to_theme = {v: k for k, v in theme_display.items()}
         theme_values = list(theme_display.values())
         theme_var.set(theme_display.get(config.THEME, self.t("theme_light")))
-        theme_combo = ttk.Combobox(win, textvariable=theme_var, values=theme_values, state="readonly")
+        theme_combo = ttk.Combobox(body, textvariable=theme_var, values=theme_values, state="readonly")
         theme_combo.pack(fill=X, padx=20, pady=(0, 4))
         theme_var.trace_add("write", lambda *_: log_event(f"Theme selection changed: {theme_var.get()}"))
 
         log_color_var = BooleanVar(value=config.LOG_COLOR)
-        chk_log_color = ttk.Checkbutton(win, variable=log_color_var)
+        chk_log_color = ttk.Checkbutton(body, variable=log_color_var)
         chk_log_color.pack(pady=(6, 0))
         log_color_var.trace_add("write", lambda *_: log_event(f"Log color toggled: {log_color_var.get()}"))
 
+        sample_estimates_var = BooleanVar(value=config.ESTIMATION_MODE == "sample")
+        chk_sample_estimates = ttk.Checkbutton(body, variable=sample_estimates_var)
+        chk_sample_estimates.pack(pady=(6, 0))
+        sample_estimates_var.trace_add(
+            "write",
+            lambda *_: log_event(f"Sampled estimates toggled: {sample_estimates_var.get()}"),
+        )
+
+        trial_encodes_var = BooleanVar(value=config.VIDEO_TRIAL_ENCODES)
+        chk_trial_encodes = ttk.Checkbutton(body, variable=trial_encodes_var)
+        chk_trial_encodes.pack(pady=(6, 0))
+        trial_encodes_var.trace_add(
+            "write",
+            lambda *_: log_event(f"Trial encodes toggled: {trial_encodes_var.get()}"),
+        )
+
+        process_backend_var = BooleanVar(value=config.DISPATCH_BACKEND == "process")
+        chk_process_backend = ttk.Checkbutton(body, variable=process_backend_var)
+        chk_process_backend.pack(pady=(6, 0))
+        process_backend_var.trace_add(
+            "write",
+            lambda *_: log_event(f"Process backend toggled: {process_backend_var.get()}"),
+        )
+
+        def spinbox_value(var, label):
+            try:
+                value = var.get()
+            except TclError:
+                value = -1
+            if value < 0:
+                raise ValueError(self.t("settings_invalid_number", field=label.cget("text")))
+            return value
+
         def save():
+            try:
+                target_mb = spinbox_value(target_mb_var, lbl_video_target_mb)
+                time_budget = spinbox_value(time_budget_var, lbl_time_budget)
+            except ValueError as e:
+                self.show_dialog(self.t("settings_error_title"), str(e), "error")
+                log_event(f"Settings save rejected: {e}")
+                return
             data = {
                 "IMAGE_QUALITY": img_var.get(),
                 "VIDEO_CRF": crf_var.get(),
                 "LANG": display_to_code.get(lang_var.get(), "fr"),
                 "LOG_COLOR": bool(log_color_var.get()),
                 "THEME": display_to_theme.get(theme_var.get(), "light"),
+                "ESTIMATION_MODE": "sample" if sample_estimates_var.get() else "ratio",
+                "DISPATCH_BACKEND": "process" if process_backend_var.get() else "thread",
+                "VIDEO_MODE": display_to_video_mode.get(video_mode_var.get(), "crf"),
+                "VIDEO_TARGET_PERCENT": target_percent_var.get(),
+                "VIDEO_TARGET_MB": target_mb,
+                "VIDEO_TRIAL_ENCODES": bool(trial_encodes_var.get()),
+                "VIDEO_QUALITY_SEARCH": bool(quality_search_var.get()),
+                "VIDEO_QUALITY_METRIC": quality_metric_var.get().lower(),
+                "VIDEO_QUALITY_TARGET": config.VIDEO_QUALITY_TARGET,
+                "VIDEO_MAX_HEIGHT": selected_cap(max_height_var, config.MAX_HEIGHTS, height_label),
+                "VIDEO_MAX_FPS": selected_cap(max_fps_var, config.MAX_FPS, fps_label),
+                "VIDEO_PROFILE": video_profile_var.get(),
+                "VIDEO_TIME_BUDGET_HOURS": time_budget,
             }
             try:
                 with open(settings_path(), "w", encoding="utf-8") as f:
@@ -1755,7 +2056,19 @@ class App(TkinterDnD.Tk):
                     f"VIDEO_CRF={config.VIDEO_CRF} "
                     f"LANG={config.LANG} "
                     f"LOG_COLOR={config.LOG_COLOR} "
-                    f"THEME={config.THEME}"
+                    f"THEME={config.THEME} "
+                    f"ESTIMATION_MODE={config.ESTIMATION_MODE} "
+                    f"DISPATCH_BACKEND={config.DISPATCH_BACKEND} "
+                    f"VIDEO_MODE={config.VIDEO_MODE} "
+                    f"VIDEO_TARGET_PERCENT={config.VIDEO_TARGET_PERCENT} "
+                    f"VIDEO_TARGET_MB={config.VIDEO_TARGET_MB} "
+                    f"VIDEO_TRIAL_ENCODES={config.VIDEO_TRIAL_ENCODES} "
+                    f"VIDEO_QUALITY_SEARCH={config.VIDEO_QUALITY_SEARCH} "
+                    f"VIDEO_QUALITY_METRIC={config.VIDEO_QUALITY_METRIC} "
+                    f"VIDEO_MAX_HEIGHT={config.VIDEO_MAX_HEIGHT} "
+                    f"VIDEO_MAX_FPS={config.VIDEO_MAX_FPS} "
+                    f"VIDEO_PROFILE={config.VIDEO_PROFILE} "
+                    f"VIDEO_TIME_BUDGET_HOURS={config.VIDEO_TIME_BUDGET_HOURS}"
                 )
 
                 self.show_dialog(
@@ -1768,11 +2081,12 @@ class App(TkinterDnD.Tk):
                 self.show_dialog(self.t("settings_error_title"), str(e), "error")
                 log_event(f"Settings save error: {e}")
 
-        btn_save = ttk.Button(win, command=lambda: self._debounced("btn_save") and save(), width=12, style="Uiverse.Primary.TButton")
-        btn_save.pack(pady=15)
+        btn_save.config(command=lambda: self._debounced("btn_save") and save())
 
         def apply_settings_theme():
             win.configure(bg=THEME["bg"])
+            body_canvas.configure(bg=THEME["bg"])
+            body.configure(bg=THEME["bg"])
             header.configure(bg=THEME["bg"])
             lbl_settings_header.configure(bg=THEME["bg"], fg=THEME["text"])
             header_sep.configure(bg=THEME["border"])
@@ -1794,6 +2108,23 @@ class App(TkinterDnD.Tk):
             lbl_settings_header.config(text=self.t("settings_header"))
             lbl_img_quality.config(text=self.t("settings_image_quality"))
             lbl_video_crf.config(text=self.t("settings_video_crf"))
+            lbl_video_profile.config(text=self.t("settings_video_profile"))
+            lbl_time_budget.config(text=self.t("settings_time_budget"))
+            lbl_video_mode.config(text=self.t("settings_video_mode"))
+            video_mode_display.update({"crf": self.t("video_mode_crf"), "size": self.t("video_mode_size")})
+            display_to_video_mode.clear()
+            display_to_video_mode.update({v: k for k, v in video_mode_display.items()})
+            video_mode_combo.config(values=list(video_mode_display.values()))
+            video_mode_var.set(video_mode_display.get(config.VIDEO_MODE, video_mode_display["crf"]))
+            lbl_video_target.config(text=self.t("settings_video_target_percent"))
+            update_target_value()
+            lbl_video_target_mb.config(text=self.t("settings_video_target_mb"))
+            chk_quality_search.config(text=self.t("settings_quality_search"))
+            lbl_video_caps.config(text=self.t("settings_video_caps"))
+            max_height_combo.config(values=[height_label(value) for value in config.MAX_HEIGHTS])
+            max_height_var.set(height_label(config.VIDEO_MAX_HEIGHT))
+            max_fps_combo.config(values=[fps_label(value) for value in config.MAX_FPS])
+            max_fps_var.set(fps_label(config.VIDEO_MAX_FPS))
             lbl_lang.config(text=self.t("settings_language"))
             theme_display.update({"light": self.t("theme_light"), "dark": self.t("theme_dark")})
             display_to_theme.clear()
@@ -1802,6 +2133,9 @@ class App(TkinterDnD.Tk):
             theme_var.set(theme_display.get(config.THEME, self.t("theme_light")))
             theme_combo_label.config(text=self.t("settings_theme"))
             chk_log_color.config(text=self.t("settings_log_color"))
+            chk_sample_estimates.config(text=self.t("settings_sample_estimates"))
+            chk_trial_encodes.config(text=self.t("settings_trial_encodes"))
+            chk_process_backend.config(text=self.t("settings_process_backend"))
             btn_save.config(text=self.t("btn_save"))
             update_img_value()
             update_crf_value()
@@ -1842,4 +2176,5 @@ def main():
     app.mainloop()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
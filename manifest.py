@@ -0,0 +1,103 @@
+import os
+import json
+import hashlib
+import threading
+import config
+from config import SUPPORTED_IMAGE, SUPPORTED_VIDEO, SUPPORTED_TEXT, SUPPORTED_PDF
+from scanner import iter_folder
+
+MANIFEST_FILE = ".smartcompressor-manifest.json"
+MANIFEST_VERSION = 1
+SAVE_EVERY = 50
+
+def settings_hash(ext: str) -> str:
+    if ext in SUPPORTED_IMAGE:
+        settings = ["image", config.IMAGE_QUALITY]
+    elif ext in SUPPORTED_VIDEO:
+        if config.VIDEO_MODE == "size":
+            settings = ["video", "size", config.VIDEO_TARGET_PERCENT, config.VIDEO_TARGET_MB]
+        elif config.VIDEO_QUALITY_SEARCH:
+            settings = ["video", "quality", config.VIDEO_QUALITY_METRIC, config.VIDEO_QUALITY_TARGET]
+        else:
+            settings = ["video", config.VIDEO_CRF]
+        if config.VIDEO_TIME_BUDGET_HOURS > 0:
+            settings += ["profile", "time-budget"]
+        elif config.VIDEO_PROFILE != config.DEFAULT_SETTINGS["VIDEO_PROFILE"]:
+            settings += ["profile", config.VIDEO_PROFILE]
+        if config.VIDEO_MAX_HEIGHT or config.VIDEO_MAX_FPS:
+            settings += ["caps", config.VIDEO_MAX_HEIGHT, config.VIDEO_MAX_FPS]
+    elif ext in SUPPORTED_TEXT:
+        settings = ["text"]
+    elif ext in SUPPORTED_PDF:
+        settings = ["pdf"]
+    else:
+        settings = ["copy"]
+    return hashlib.sha1(json.dumps(settings).encode("utf-8")).hexdigest()[:16]
+
+class Manifest:
+    def __init__(self, output_root):
+        self.output_root = output_root
+        self.path = os.path.join(output_root, MANIFEST_FILE)
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self.entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+            return {}
+        files = data.get("files")
+        return files if isinstance(files, dict) else {}
+
+    def split(self, records):
+        outputs = {
+            output.relative: output.size
+            for output in iter_folder(self.output_root)
+        } if self.entries else {}
+        pending = []
+        current = []
+        for record in records:
+            entry = self.entries.get(record.relative)
+            if (
+                entry
+                and entry.get("size") == record.size
+                and entry.get("mtime") == record.mtime
+                and entry.get("settings") == settings_hash(record.ext)
+                and outputs.get(record.relative) == entry.get("output_size")
+            ):
+                current.append((record, entry["output_size"]))
+            else:
+                pending.append(record)
+        return pending, current
+
+    def update(self, record, output_size):
+        with self._lock:
+            self.entries[record.relative] = {
+                "size": record.size,
+                "mtime": record.mtime,
+                "settings": settings_hash(record.ext),
+                "output_size": output_size,
+            }
+            self._unsaved += 1
+            due = self._unsaved >= SAVE_EVERY
+        if due:
+            try:
+                self.save()
+            except OSError:
+                pass
+
+    def save(self):
+        with self._lock:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"version": MANIFEST_VERSION, "files": self.entries},
+                    f,
+                    separators=(",", ":"),
+                )
+            os.replace(tmp, self.path)
+            self._unsaved = 0
@@ -0,0 +1,169 @@
+import os
+import json
+import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+import fitz
+
+import config
+from config import SUPPORTED_IMAGE, SUPPORTED_VIDEO, SUPPORTED_PDF
+from scanner import FileRecord
+from setup_check import get_ffmpeg_paths
+from utils.process import hidden_process_kwargs
+
+# Recently probed files, keyed by path, size and mtime; bounded so repeated
+# analyses of large trees do not grow it without limit.
+PROBE_MEMO_SIZE = 4096
+_probes = OrderedDict()
+_probes_lock = threading.Lock()
+
+def _ratio(value):
+    try:
+        num, _, den = str(value).partition("/")
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+def _number(value, cast=float):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return 0
+
+def parse(data: dict) -> dict:
+    fmt = data.get("format") or {}
+    info = {
+        "duration": _number(fmt.get("duration")),
+        "bit_rate": _number(fmt.get("bit_rate"), int),
+        "format": fmt.get("format_name", ""),
+        "video": None,
+        "audio": [],
+        "subtitles": [],
+        "data": [],
+    }
+    for stream in data.get("streams") or []:
+        kind = stream.get("codec_type")
+        if kind == "video" and info["video"] is None:
+            if (stream.get("disposition") or {}).get("attached_pic"):
+                continue
+            info["video"] = {
+                "index": _number(stream.get("index"), int),
+                "codec": stream.get("codec_name", ""),
+                "width": _number(stream.get("width"), int),
+                "height": _number(stream.get("height"), int),
+                "fps": _ratio(stream.get("avg_frame_rate")) or _ratio(stream.get("r_frame_rate")),
+                "bit_rate": _number(stream.get("bit_rate"), int),
+            }
+        elif kind == "audio":
+            info["audio"].append({
+                "index": _number(stream.get("index"), int),
+                "codec": stream.get("codec_name", ""),
+                "channels": _number(stream.get("channels"), int),
+                "bit_rate": _number(stream.get("bit_rate"), int),
+            })
+        elif kind == "subtitle":
+            info["subtitles"].append({
+                "index": _number(stream.get("index"), int),
+                "codec": stream.get("codec_name", ""),
+            })
+        elif kind in ("data", "attachment"):
+            info["data"].append({
+                "index": _number(stream.get("index"), int),
+                "codec": stream.get("codec_name", ""),
+                "type": kind,
+            })
+    return info
+
+def probe_video(path: str, timeout: float | None = None) -> dict | None:
+    _, ffprobe, env = get_ffmpeg_paths()
+    try:
+        result = subprocess.run(
+            [ffprobe, "-v", "error", "-show_format", "-show_streams", "-of", "json", path],
+            capture_output=True,
+            text=True,
+            env=env,
+            timeout=timeout,
+            **hidden_process_kwargs(),
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if result.returncode != 0:
+        return None
+    try:
+        return parse(json.loads(result.stdout or "{}"))
+    except ValueError:
+        return None
+
+def probe_image(path: str) -> dict:
+    with Image.open(path) as img:
+        width, height = img.size
+    return {"width": width, "height": height, "pixels": width * height}
+
+def probe_pdf(path: str) -> dict:
+    with fitz.open(path) as doc:
+        return {"pages": doc.page_count}
+
+def _key(record):
+    return record.path, record.size, record.mtime
+
+def remember(record, info: dict | None):
+    if info is not None:
+        with _probes_lock:
+            _probes[_key(record)] = info
+            _probes.move_to_end(_key(record))
+            while len(_probes) > PROBE_MEMO_SIZE:
+                _probes.popitem(last=False)
+
+def _probe_media(record, timeout: float | None = None) -> dict | None:
+    try:
+        if record.ext in SUPPORTED_VIDEO:
+            return probe_video(record.path, timeout=timeout)
+        if record.ext in SUPPORTED_IMAGE:
+            return probe_image(record.path)
+        if record.ext in SUPPORTED_PDF:
+            return probe_pdf(record.path)
+    except Exception:
+        return None
+    return None
+
+def probe_media(record, timeout: float | None = None) -> dict | None:
+    with _probes_lock:
+        info = _probes.get(_key(record))
+        if info is not None:
+            _probes.move_to_end(_key(record))
+    if info is None:
+        info = _probe_media(record, timeout)
+        remember(record, info)
+    return info
+
+def probe_path(path: str, timeout: float | None = None) -> dict | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    record = FileRecord(path, st.st_size, st.st_mtime, os.path.splitext(path)[1].lower(), os.path.basename(path))
+    return probe_media(record, timeout)
+
+def probe_many(records, workers=None, cache=None) -> dict:
+    workers = workers or config.MAX_WORKERS or 4
+    probes = {}
+    missing = []
+    for record in records:
+        entry = cache.get(record) if cache else None
+        if entry and entry["probe"] is not None:
+            remember(record, entry["probe"])
+            probes[record.path] = entry["probe"]
+        else:
+            missing.append(record)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="probe") as executor:
+        for record, info in zip(missing, executor.map(probe_media, missing)):
+            if info is None:
+                continue
+            probes[record.path] = info
+            if cache:
+                cache.put_probe(record, info)
+    if cache:
+        cache.commit()
+    return probes
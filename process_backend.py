@@ -0,0 +1,111 @@
+import itertools
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+import config
+from config import SUPPORTED_IMAGE, SUPPORTED_PDF, SUPPORTED_TEXT
+
+PROCESS_EXTENSIONS = SUPPORTED_IMAGE + SUPPORTED_PDF + SUPPORTED_TEXT
+PROCESS_WORKERS = config.MAX_WORKERS or 4
+POLL_INTERVAL = 0.2
+WORKER_SETTINGS = ("IMAGE_QUALITY", "VIDEO_CRF")
+
+_progress = None
+_cancel = None
+_dispatch = None
+_control = None
+
+class _WorkerControl:
+    def __init__(self, stop_event):
+        self.stop_event = stop_event
+
+def _init_worker(progress, cancel):
+    global _progress, _cancel, _dispatch, _control
+    from dispatcher import dispatch
+    _progress = progress
+    _cancel = cancel
+    _dispatch = dispatch
+    _control = _WorkerControl(cancel)
+
+def _run(task_id, task, settings):
+    src, dst = task[0], task[1]
+    if _cancel.is_set():
+        return src, dst, False, None, {"cancelled": True}
+    for name, value in settings.items():
+        setattr(config, name, value)
+
+    def report(percent):
+        _progress.put((task_id, percent))
+
+    return _dispatch((*task, report, _control))
+
+def warm_up():
+    return True
+
+class ProcessBackend:
+    def __init__(self, workers=PROCESS_WORKERS):
+        self._manager = multiprocessing.Manager()
+        self._progress = self._manager.Queue()
+        self._cancel = self._manager.Event()
+        self._executor = ProcessPoolExecutor(
+            max_workers=max(1, workers),
+            initializer=_init_worker,
+            initargs=(self._progress, self._cancel),
+        )
+        self._callbacks = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._listener = threading.Thread(target=self._forward_progress, name="process-progress", daemon=True)
+        self._listener.start()
+        for future in [self._executor.submit(warm_up) for _ in range(max(1, workers))]:
+            future.result()
+
+    def _forward_progress(self):
+        while not self._closed.is_set():
+            try:
+                task_id, percent = self._progress.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                callback = self._callbacks.get(task_id)
+            if callback:
+                callback(percent)
+
+    def reset(self):
+        self._cancel.clear()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def dispatch(self, task):
+        src, dst, ext, use_gpu = task[:4]
+        progress_callback = task[4] if len(task) > 4 else None
+        control = task[5] if len(task) > 5 else None
+        settings = {name: getattr(config, name) for name in WORKER_SETTINGS}
+        task_id = next(self._ids)
+        with self._lock:
+            self._callbacks[task_id] = progress_callback
+        try:
+            future = self._executor.submit(_run, task_id, (src, dst, ext, use_gpu), settings)
+            while True:
+                try:
+                    return future.result(timeout=POLL_INTERVAL)
+                except FutureTimeout:
+                    if control is not None and control.stop_event.is_set():
+                        self.cancel()
+                        if future.cancel():
+                            return src, dst, False, None, {"cancelled": True}
+        finally:
+            with self._lock:
+                self._callbacks.pop(task_id, None)
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._closed.set()
+        self._listener.join()
+        self._manager.shutdown()
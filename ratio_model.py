@@ -0,0 +1,146 @@
+import math
+import time
+import sqlite3
+import threading
+from manifest import settings_hash
+from utils.paths import cache_dir
+
+HISTORY_FILE = "history.sqlite"
+MIN_SAMPLES = 5
+MAX_ROWS = 50_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ext TEXT NOT NULL,
+    size_bucket INTEGER NOT NULL,
+    media_bucket TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    original_size INTEGER NOT NULL,
+    compressed_size INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+
+def size_bucket(size: int) -> int:
+    return int(math.log2(max(size, 1)))
+
+def media_bucket(probe) -> str:
+    if not probe:
+        return ""
+    video = probe.get("video")
+    if video:
+        height = video.get("height") or 0
+        rate = (video.get("bit_rate") or probe.get("bit_rate") or 0) // 1_000_000
+        return f"{height}p:{min(rate, 50)}M"
+    pixels = probe.get("pixels")
+    if pixels:
+        return f"{pixels // 1_000_000}MP"
+    return ""
+
+class RatioModel:
+    def __init__(self, path=None):
+        self.path = str(path or cache_dir() / HISTORY_FILE)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+        self._stats = {}
+        self.version = 0
+        self.fit()
+
+    def record(self, record, compressed_size, seconds, probe=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO results (ext, size_bucket, media_bucket, settings, "
+                "original_size, compressed_size, seconds, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    record.ext,
+                    size_bucket(record.size),
+                    media_bucket(probe),
+                    settings_hash(record.ext),
+                    record.size,
+                    compressed_size,
+                    max(0.0, seconds),
+                    time.time(),
+                ),
+            )
+
+    def save(self):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM results WHERE id <= (SELECT MAX(id) FROM results) - ?",
+                (MAX_ROWS,),
+            )
+            self._conn.commit()
+
+    def fit(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT ext, settings, size_bucket, media_bucket, COUNT(*), "
+                "SUM(original_size), SUM(compressed_size), SUM(seconds) "
+                "FROM results GROUP BY ext, settings, size_bucket, media_bucket"
+            ).fetchall()
+        stats = {}
+        version = 0
+        for ext, settings, bucket, media, count, original, compressed, seconds in rows:
+            version += count
+            for key in (
+                (ext, settings, bucket, media),
+                (ext, settings, bucket),
+                (ext, settings),
+            ):
+                total = stats.setdefault(key, [0, 0, 0, 0.0])
+                total[0] += count
+                total[1] += original
+                total[2] += compressed
+                total[3] += seconds
+        self._stats = stats
+        self.version = version
+
+    def _lookup(self, record, probe):
+        settings = settings_hash(record.ext)
+        bucket = size_bucket(record.size)
+        for key in (
+            (record.ext, settings, bucket, media_bucket(probe)),
+            (record.ext, settings, bucket),
+            (record.ext, settings),
+        ):
+            total = self._stats.get(key)
+            if total and total[0] >= MIN_SAMPLES and total[1] > 0:
+                return total
+        return None
+
+    def ratio(self, record, probe=None):
+        total = self._lookup(record, probe)
+        if total is None:
+            return None
+        return total[2] / total[1]
+
+    def seconds(self, record, probe=None):
+        total = self._lookup(record, probe)
+        if total is None or total[3] <= 0:
+            return None
+        return record.size * total[3] / total[1]
+
+    def close(self):
+        with self._lock:
+            try:
+                self._conn.commit()
+            finally:
+                self._conn.close()
+
+_model = None
+_model_lock = threading.Lock()
+
+def get_model():
+    global _model
+    with _model_lock:
+        if _model is None:
+            try:
+                _model = RatioModel()
+            except sqlite3.Error:
+                return None
+        return _model
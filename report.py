@@ -1,13 +1,17 @@
 import csv
-import os
 
 def generate(csv_path, rows):
     with open(csv_path, "w", newline="", encoding="utf-8") as f:
         w = csv.writer(f)
-        w.writerow(["Fichier","Original","Compressé","Gain"])
+        w.writerow(["Fichier","Original","Compressé","Gain","Action","Raison"])
 
-        for src, dst in rows:
-            if os.path.exists(dst):
-                o = os.path.getsize(src)
-                c = os.path.getsize(dst)
-                w.writerow([src, o, c, o - c])
+        for src, original_size, compressed_size, details in rows:
+            if compressed_size is not None:
+                w.writerow([
+                    src,
+                    original_size,
+                    compressed_size,
+                    original_size - compressed_size,
+                    details.get("action", ""),
+                    details.get("reason", ""),
+                ])
@@ -1,13 +1,72 @@
 import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import NamedTuple
 from config import SUPPORTED_IMAGE, SUPPORTED_VIDEO, SUPPORTED_TEXT, SUPPORTED_PDF
 
-def scan_folder(folder: str):
-    files = []
-    for root, _, filenames in os.walk(folder):
-        for f in filenames:
-            path = os.path.join(root, f)
-            ext = os.path.splitext(f)[1].lower()
+SUPPORTED_ALL = SUPPORTED_IMAGE + SUPPORTED_VIDEO + SUPPORTED_TEXT + SUPPORTED_PDF
 
-            if ext in SUPPORTED_IMAGE + SUPPORTED_VIDEO + SUPPORTED_TEXT + SUPPORTED_PDF:
-                files.append(path)
-    return files
+SCAN_WORKERS = min(32, (os.cpu_count() or 4) * 4)
+
+class FileRecord(NamedTuple):
+    path: str
+    size: int
+    mtime: float
+    ext: str
+    relative: str
+
+def _scan_dir(folder, relative_dir):
+    current = os.path.join(folder, relative_dir) if relative_dir else folder
+    records = []
+    subdirs = []
+    errors = []
+    try:
+        entries = list(os.scandir(current))
+    except OSError as exc:
+        return records, subdirs, [(current, exc)]
+
+    for entry in entries:
+        relative = os.path.join(relative_dir, entry.name) if relative_dir else entry.name
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(relative)
+                continue
+            ext = os.path.splitext(entry.name)[1].lower()
+            if ext not in SUPPORTED_ALL or not entry.is_file():
+                continue
+            st = entry.stat()
+        except OSError as exc:
+            errors.append((entry.path, exc))
+            continue
+        records.append(FileRecord(entry.path, st.st_size, st.st_mtime, ext, relative))
+    return records, subdirs, errors
+
+def iter_folder(folder: str, on_error=None, workers: int = SCAN_WORKERS):
+    if workers <= 1:
+        pending = [""]
+        while pending:
+            records, subdirs, errors = _scan_dir(folder, pending.pop())
+            for path, exc in errors:
+                if on_error:
+                    on_error(path, exc)
+            yield from records
+            pending.extend(reversed(subdirs))
+        return
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan")
+    try:
+        running = {executor.submit(_scan_dir, folder, "")}
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                records, subdirs, errors = future.result()
+                for subdir in subdirs:
+                    running.add(executor.submit(_scan_dir, folder, subdir))
+                for path, exc in errors:
+                    if on_error:
+                        on_error(path, exc)
+                yield from records
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def scan_folder(folder: str, on_error=None, workers: int = SCAN_WORKERS):
+    return list(iter_folder(folder, on_error=on_error, workers=workers))
@@ -0,0 +1,376 @@
+import heapq
+import time
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, NamedTuple
+import config
+from utils.process import resume_process, suspend_process, terminate_process
+from config import SUPPORTED_IMAGE, SUPPORTED_VIDEO, SUPPORTED_TEXT, SUPPORTED_PDF
+from compressors.video_compressor import (
+    DEFAULT_THREAD_BUDGET,
+    decide,
+    encoder_settings,
+    is_segmented,
+    output_pixel_rate,
+    select_encoder,
+    thread_budget,
+)
+
+CPU_SLOTS = config.MAX_WORKERS or 4
+FFMPEG_SLOTS = max(2, CPU_SLOTS // 2)
+NVENC_SESSIONS = 3
+IO_SLOTS = max(8, CPU_SLOTS)
+
+MAX_PENDING = 256
+POLL_INTERVAL = 0.2
+
+# Rough seconds of work per unit, used only to rank jobs and to predict the
+# makespan; the absolute values matter less than their proportions.
+VIDEO_SECONDS_PER_PIXEL_SECOND = 1 / (1920 * 1080)
+NVENC_SPEEDUP = 8.0
+IMAGE_SECONDS_PER_PIXEL = 2.5e-8
+PDF_SECONDS_PER_PAGE = 0.05
+FALLBACK_BYTES_PER_SECOND = {
+    "video": 2 * 1024 * 1024,
+    "image": 20 * 1024 * 1024,
+    "pdf": 10 * 1024 * 1024,
+    "text": 50 * 1024 * 1024,
+    "copy": 100 * 1024 * 1024,
+}
+
+class CompressionControl:
+    def __init__(self):
+        self.stop_event = threading.Event()
+        self.pause_event = threading.Event()
+        self.condition = threading.Condition()
+        self._processes = set()
+        self._suspended = set()
+        self._process_lock = threading.Lock()
+        self.stop_requested_at = None
+
+    def register(self, process):
+        with self._process_lock:
+            self._processes.add(process)
+            if self.pause_event.is_set():
+                self._suspend(process)
+        if self.stop_event.is_set():
+            terminate_process(process)
+
+    def unregister(self, process):
+        with self._process_lock:
+            self._processes.discard(process)
+            self._suspended.discard(process)
+
+    def _suspend(self, process):
+        if process not in self._suspended and process.poll() is None and suspend_process(process.pid):
+            self._suspended.add(process)
+
+    def pause(self):
+        with self._process_lock:
+            self.pause_event.set()
+            for process in self._processes:
+                self._suspend(process)
+        with self.condition:
+            self.condition.notify_all()
+
+    def resume(self):
+        with self._process_lock:
+            self.pause_event.clear()
+            for process in self._suspended:
+                resume_process(process.pid)
+            self._suspended.clear()
+        with self.condition:
+            self.condition.notify_all()
+
+    def stop(self):
+        if self.stop_requested_at is None:
+            self.stop_requested_at = time.monotonic()
+        self.stop_event.set()
+        self.resume()
+        with self._process_lock:
+            processes = list(self._processes)
+        for process in processes:
+            threading.Thread(target=terminate_process, args=(process,), name="terminate", daemon=True).start()
+
+    def stop_latency(self):
+        if self.stop_requested_at is None:
+            return None
+        return time.monotonic() - self.stop_requested_at
+
+    def suspended(self):
+        with self._process_lock:
+            return len(self._suspended)
+
+class Job(NamedTuple):
+    record: object
+    resources: dict
+    run: Callable
+    cost: float = 0.0
+
+# Called when the scheduler starts the job, so the planner sees how far the
+# encodes before it actually got.
+def job_options(record, use_gpu, probe=None, planner=None):
+    if record.ext in SUPPORTED_VIDEO:
+        profile = planner.choose(record) if planner else None
+        codec, use_nvenc = select_encoder(record.ext, use_gpu, profile)
+        options = {"threads": thread_budget(probe, use_nvenc, codec, profile), "probe": probe, "record": record}
+        if profile:
+            options["profile"] = profile
+        return options
+    return {}
+
+def video_work(record, probe, use_gpu=False):
+    if record.ext not in SUPPORTED_VIDEO or decide(probe, record.size)[0] != "encode":
+        return 0.0
+    if select_encoder(record.ext, use_gpu)[1]:
+        return 0.0
+    return output_pixel_rate(probe) * ((probe or {}).get("duration") or 0.0)
+
+def video_parallelism():
+    return max(1, min(FFMPEG_SLOTS, CPU_SLOTS // DEFAULT_THREAD_BUDGET))
+
+# Picks, when each video starts, the slowest calibrated profile whose predicted
+# encode time fits that video's share of the time left before the deadline.
+class TimeBudgetPlanner:
+    def __init__(self, records, probes, rates, seconds, use_gpu=False, parallel=None):
+        self.rates = dict(rates)
+        self.deadline = time.monotonic() + seconds
+        self.parallel = parallel or video_parallelism()
+        self._lock = threading.Lock()
+        self._work = {}
+        for record in records:
+            work = video_work(record, probes.get(record.path), use_gpu)
+            if work > 0:
+                self._work[record.path] = work
+        self._remaining = sum(self._work.values())
+        self._running = {}
+
+    def candidates(self, record):
+        with self._lock:
+            return tuple(self.rates) if record.path in self._work else (None,)
+
+    def choose(self, record):
+        with self._lock:
+            work = self._work.pop(record.path, None)
+            if work is None or not self.rates:
+                return None
+            now = time.monotonic()
+            busy = sum(max(0.0, predicted - (now - started)) for started, predicted in self._running.values())
+            capacity = max(0.0, (self.deadline - now) * self.parallel - busy)
+            share = capacity * work / max(self._remaining, work)
+            self._remaining = max(0.0, self._remaining - work)
+            fitting = [profile for profile, rate in self.rates.items() if work / rate <= share]
+            if fitting:
+                profile = min(fitting, key=self.rates.get)
+            else:
+                profile = max(self.rates, key=self.rates.get)
+            self._running[record.path] = (now, work / self.rates[profile])
+            return profile
+
+    def done(self, record):
+        with self._lock:
+            self._running.pop(record.path, None)
+
+def default_budgets():
+    return {
+        "cpu": CPU_SLOTS,
+        "ffmpeg": FFMPEG_SLOTS,
+        "nvenc": NVENC_SESSIONS,
+        "io": IO_SLOTS,
+    }
+
+# The profile is only chosen once the job starts, so the reservation covers the
+# most demanding profile the planner may pick.
+def job_resources(record, use_gpu, probe=None, planner=None):
+    if record.ext in SUPPORTED_VIDEO:
+        if decide(probe, record.size)[0] != "encode":
+            return {"ffmpeg": 1, "io": 1}
+        threads, use_nvenc = 0, False
+        for profile in planner.candidates(record) if planner else (None,):
+            codec, hardware = select_encoder(record.ext, use_gpu, profile)
+            threads = max(threads, thread_budget(probe, hardware, codec, profile))
+            use_nvenc = use_nvenc or hardware
+        if is_segmented(probe, use_nvenc):
+            threads = CPU_SLOTS
+        if use_nvenc:
+            return {"ffmpeg": 1, "nvenc": 1, "cpu": threads, "io": 1}
+        return {"ffmpeg": 1, "cpu": threads, "io": 1}
+    if record.ext in SUPPORTED_IMAGE or record.ext in SUPPORTED_PDF:
+        return {"cpu": 1, "io": 1}
+    return {"io": 1}
+
+def predict_cost(record, probe=None, use_gpu=False, profile=None):
+    if record.ext in SUPPORTED_VIDEO:
+        if decide(probe, record.size)[0] != "encode":
+            return record.size / FALLBACK_BYTES_PER_SECOND["copy"]
+        video = (probe or {}).get("video")
+        duration = (probe or {}).get("duration")
+        if video and duration and video.get("width") and video.get("height"):
+            cost = duration * video["width"] * video["height"] * VIDEO_SECONDS_PER_PIXEL_SECOND
+        else:
+            cost = record.size / FALLBACK_BYTES_PER_SECOND["video"]
+        codec, use_nvenc = select_encoder(record.ext, use_gpu, profile)
+        if use_nvenc:
+            return cost / NVENC_SPEEDUP
+        return cost * encoder_settings(codec, profile)["cost_factor"]
+    if record.ext in SUPPORTED_IMAGE:
+        pixels = (probe or {}).get("pixels")
+        if pixels:
+            return pixels * IMAGE_SECONDS_PER_PIXEL
+        return record.size / FALLBACK_BYTES_PER_SECOND["image"]
+    if record.ext in SUPPORTED_PDF:
+        pages = (probe or {}).get("pages")
+        if pages:
+            return pages * PDF_SECONDS_PER_PAGE
+        return record.size / FALLBACK_BYTES_PER_SECOND["pdf"]
+    if record.ext in SUPPORTED_TEXT:
+        return record.size / FALLBACK_BYTES_PER_SECOND["text"]
+    return 0.0
+
+def order_by_cost(jobs):
+    return sorted(jobs, key=lambda job: job.cost, reverse=True)
+
+# Waiting jobs are queued per kind of need: jobs with identical needs never
+# overtake each other, so only queue heads are checked when admitting.
+class _Waiting:
+    def __init__(self):
+        self._queues = {}
+        self._count = 0
+        self._arrival = 0
+
+    def __len__(self):
+        return self._count
+
+    def push(self, job, needs):
+        key = tuple(sorted(needs.items()))
+        self._queues.setdefault(key, deque()).append((self._arrival, job, needs))
+        self._arrival += 1
+        self._count += 1
+
+    def pop_fitting(self, available):
+        best = None
+        for key, queue in self._queues.items():
+            arrival, _, needs = queue[0]
+            if best is not None and arrival > best[0]:
+                continue
+            if all(available[name] >= amount for name, amount in needs.items()):
+                best = (arrival, key)
+        if best is None:
+            return None
+        queue = self._queues[best[1]]
+        _, job, needs = queue.popleft()
+        if not queue:
+            del self._queues[best[1]]
+        self._count -= 1
+        return job, needs
+
+def _job_needs(job, budgets):
+    return {
+        name: min(amount, budgets[name])
+        for name, amount in job.resources.items()
+        if name in budgets
+    }
+
+def predict_makespan(jobs, budgets=None, max_pending=MAX_PENDING):
+    budgets = dict(budgets or default_budgets())
+    available = dict(budgets)
+    jobs = iter(jobs)
+    waiting = _Waiting()
+    running = []
+    now = 0.0
+    exhausted = False
+    while True:
+        while not exhausted and len(waiting) < max_pending:
+            try:
+                job = next(jobs)
+            except StopIteration:
+                exhausted = True
+                break
+            waiting.push(job, _job_needs(job, budgets))
+        while True:
+            item = waiting.pop_fitting(available)
+            if item is None:
+                break
+            job, needs = item
+            for name, amount in needs.items():
+                available[name] -= amount
+            heapq.heappush(running, (now + job.cost, id(job), needs))
+        if not running:
+            break
+        now, _, needs = heapq.heappop(running)
+        for name, amount in needs.items():
+            available[name] += amount
+    return now
+
+class Scheduler:
+    def __init__(self, budgets=None, max_pending=MAX_PENDING):
+        self.budgets = dict(budgets or default_budgets())
+        self.max_pending = max_pending
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(1, sum(self.budgets.values())),
+                    thread_name_prefix="job",
+                )
+            return self._executor
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def run(self, jobs, control=None):
+        def stopped():
+            return control is not None and control.stop_event.is_set()
+
+        def paused():
+            return control is not None and control.pause_event.is_set()
+
+        executor = self._pool()
+        available = dict(self.budgets)
+        jobs = iter(jobs)
+        waiting = _Waiting()
+        running = {}
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(waiting) < self.max_pending:
+                    try:
+                        job = next(jobs)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    waiting.push(job, _job_needs(job, self.budgets))
+
+                while not stopped() and not paused():
+                    item = waiting.pop_fitting(available)
+                    if item is None:
+                        break
+                    job, needs = item
+                    for name, amount in needs.items():
+                        available[name] -= amount
+                    running[executor.submit(job.run)] = (job, needs)
+
+                if not running:
+                    if stopped() or (exhausted and not waiting):
+                        break
+                    if paused():
+                        with control.condition:
+                            control.condition.wait(timeout=POLL_INTERVAL)
+                    continue
+
+                done, _ = wait(running, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job, needs = running.pop(future)
+                    for name, amount in needs.items():
+                        available[name] += amount
+                    yield job, future
+        finally:
+            if running:
+                wait(running)
@@ -56,21 +56,9 @@ def check_ffmpeg():
         fail("FFmpeg présent mais inutilisable")
 
 def check_nvenc():
-    ffmpeg, _, env = get_ffmpeg_paths()
+    from capabilities import has_nvenc
     try:
-        r = subprocess.run(
-            [ffmpeg, "-encoders"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.DEVNULL,
-            text=True,
-            env=env,
-            **hidden_process_kwargs(),
-        )
-
-        if ("h264_nvenc" in r.stdout) or ("hevc_nvenc" in r.stdout):
-            return True
-        else:
-            return False
+        return has_nvenc()
     except Exception:
         return False
 
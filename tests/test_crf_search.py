@@ -0,0 +1,42 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from compressors import video_compressor
+
+FFMPEG = shutil.which("ffmpeg")
+
+@pytest.fixture
+def lossless_source(tmp_path):
+    if not FFMPEG:
+        pytest.skip("ffmpeg introuvable")
+    def build(fps):
+        src = tmp_path / f"src{fps}.mp4"
+        subprocess.run(
+            [
+                FFMPEG, "-y", "-hide_banner", "-loglevel", "error",
+                "-f", "lavfi", "-i", f"testsrc2=size=320x240:rate={fps}:duration=6",
+                "-c:v", "libx264", "-qp", "0", "-pix_fmt", "yuv420p", str(src),
+            ],
+            check=True,
+        )
+        return src
+    return build
+
+# libx264 at CRF 0 is lossless, so the score must hit the metric's ceiling;
+# a rounding container time base pairs the wrong frames and scores far lower.
+@pytest.mark.parametrize("fps", [30, 60])
+@pytest.mark.parametrize("metric, ceiling", [("psnr", 60.0), ("ssim", 0.999)])
+def test_lossless_clip_scores_at_ceiling(lossless_source, tmp_path, monkeypatch, fps, metric, ceiling):
+    monkeypatch.setattr(config, "VIDEO_QUALITY_METRIC", metric)
+    src = lossless_source(fps)
+    score = video_compressor.score_crf(
+        FFMPEG, dict(os.environ), str(src), str(tmp_path / "clip.nut"), "libx264", False, 0, 2, 1.0, 4.0,
+    )
+    assert score >= ceiling
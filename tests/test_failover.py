@@ -0,0 +1,73 @@
+import os
+import sys
+import stat
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from capabilities import Capabilities, set_capabilities
+from compressors import video_compressor
+
+# Lists hevc_nvenc but fails every command using it, like an NVENC build on a
+# machine without an NVIDIA GPU; any other encode writes a small output file.
+STUB_FFMPEG = """#!/bin/sh
+echo "$@" >> "$(dirname "$0")/calls.log"
+case "$*" in
+  *-encoders*) printf 'Encoders:\\n ------\\n V....D hevc_nvenc NVIDIA\\n V....D libx265 H.265\\n V....D libx264 H.264\\n';;
+  *-hwaccels*) printf 'Hardware acceleration methods:\\ncuda\\n';;
+  *hevc_nvenc*) exit 1;;
+  *) for last; do :; done; [ "$last" = "-" ] || printf 'encoded' > "$last";;
+esac
+"""
+
+PROBE = {
+    "duration": 60.0,
+    "bit_rate": 20_000_000,
+    "video": {"index": 0, "codec": "mpeg4", "width": 1280, "height": 720, "fps": 30, "bit_rate": 20_000_000},
+}
+
+@pytest.fixture
+def stub_ffmpeg(tmp_path, monkeypatch):
+    if os.name == "nt":
+        pytest.skip("shell stub")
+    ffmpeg = tmp_path / "ffmpeg"
+    ffmpeg.write_text(STUB_FFMPEG)
+    ffmpeg.chmod(ffmpeg.stat().st_mode | stat.S_IXUSR)
+    monkeypatch.setattr(config, "VIDEO_MODE", "crf")
+    monkeypatch.setattr(config, "VIDEO_QUALITY_SEARCH", False)
+    monkeypatch.setattr(config, "VIDEO_MAX_HEIGHT", 0)
+    monkeypatch.setattr(config, "VIDEO_MAX_FPS", 0)
+    capabilities = Capabilities(str(ffmpeg), dict(os.environ), tmp_path / "capabilities.json")
+    previous = set_capabilities(capabilities)
+    yield capabilities, tmp_path / "calls.log"
+    set_capabilities(previous)
+
+def test_nvenc_failure_falls_back_to_libx265(stub_ffmpeg, tmp_path):
+    capabilities, calls = stub_ffmpeg
+    src = tmp_path / "clip.avi"
+    src.write_bytes(b"\0" * 100_000)
+    dst = tmp_path / "out.avi"
+
+    assert video_compressor.encoder_chain(".avi", True)[:2] == ["hevc_nvenc", "libx265"]
+    result = video_compressor.compress(str(src), str(dst), use_gpu=True, probe=PROBE)
+
+    assert result["action"] == "encode"
+    assert "fallback to libx265" in result["reason"]
+    assert dst.read_bytes() == b"encoded"
+    assert "hevc_nvenc" in capabilities.failed()
+    assert video_compressor.encoder_chain(".avi", True)[0] == "libx265"
+    encodes = [line for line in calls.read_text().splitlines() if str(dst) in line]
+    assert ["hevc_nvenc" in line for line in encodes] == [True, False]
+    # The fallback stays within the threads reserved for the NVENC job.
+    assert f"pools={video_compressor.NVENC_THREADS}" in encodes[1]
+
+def test_smoke_test_is_cached_with_the_binary(stub_ffmpeg, tmp_path):
+    capabilities, calls = stub_ffmpeg
+    assert not capabilities.works("hevc_nvenc")
+    capabilities.reset()
+    assert not capabilities.works("hevc_nvenc")
+    fresh = Capabilities(capabilities.ffmpeg, capabilities.env, capabilities.cache_path)
+    assert not fresh.works("hevc_nvenc")
+    assert sum("color=c=black" in line for line in calls.read_text().splitlines()) == 1
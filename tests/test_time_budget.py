@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scheduler
+from scanner import FileRecord
+from scheduler import TimeBudgetPlanner
+
+RATES = {"fast": 10.0, "slow": 2.0}
+WORK = 100.0
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(scheduler.time, "monotonic", clock)
+    monkeypatch.setattr(scheduler, "video_work", lambda record, probe, use_gpu=False: WORK)
+    return clock
+
+def planner_for(count, seconds):
+    records = [FileRecord(f"/v{n}.mkv", 1, 0.0, ".mkv", f"v{n}.mkv") for n in range(count)]
+    return records, TimeBudgetPlanner(records, {}, RATES, seconds, parallel=1)
+
+@pytest.mark.parametrize("finished_at, expected", [(20.0, "slow"), (100.0, "fast")])
+def test_later_pick_follows_actual_encode_time(clock, finished_at, expected):
+    records, planner = planner_for(3, 160)
+    # 160 s for 300 units of work: the first video's share (53 s) fits the
+    # slow profile's predicted 50 s.
+    assert planner.choose(records[0]) == "slow"
+    clock.now = finished_at
+    planner.done(records[0])
+    assert planner.choose(records[1]) == expected
+
+def test_running_job_keeps_its_predicted_time_reserved(clock):
+    records, planner = planner_for(3, 160)
+    assert planner.choose(records[0]) == "slow"
+    clock.now = 20.0
+    # Still 30 s of predicted encode left: 110 s for 200 units leaves 55 s.
+    assert planner.choose(records[1]) == "slow"
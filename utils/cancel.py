@@ -0,0 +1,11 @@
+class Cancelled(Exception):
+    pass
+
+
+def is_cancelled(control):
+    return control is not None and control.stop_event.is_set()
+
+
+def check_cancelled(control):
+    if is_cancelled(control):
+        raise Cancelled("Compression annulée")
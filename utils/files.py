@@ -1,4 +1,33 @@
 import os
+import shutil
+from utils.cancel import check_cancelled
+
+COPY_CHUNK = 8 * 1024 * 1024
 
 def file_size(path):
     return os.path.getsize(path)
+
+def make_output_dirs(records, output_root):
+    folders = sorted({os.path.dirname(record.relative) for record in records})
+    os.makedirs(output_root, exist_ok=True)
+    for i, folder in enumerate(folders):
+        if not folder:
+            continue
+        if i + 1 < len(folders) and folders[i + 1].startswith(folder + os.sep):
+            continue
+        os.makedirs(os.path.join(output_root, folder), exist_ok=True)
+
+def part_path(dst):
+    root, ext = os.path.splitext(dst)
+    return f"{root}.part{ext}"
+
+def copy_file(src, dst, control=None):
+    check_cancelled(control)
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        while True:
+            chunk = fsrc.read(COPY_CHUNK)
+            if not chunk:
+                break
+            fdst.write(chunk)
+            check_cancelled(control)
+    shutil.copystat(src, dst)
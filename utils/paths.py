@@ -29,5 +29,10 @@ def log_dir(app_name: str = "SmartCompressor") -> Path:
     p.mkdir(parents=True, exist_ok=True)
     return p
 
+def cache_dir(app_name: str = "SmartCompressor") -> Path:
+    p = user_data_dir(app_name) / "cache"
+    p.mkdir(parents=True, exist_ok=True)
+    return p
+
 def settings_path(app_name: str = "SmartCompressor") -> Path:
     return settings_dir(app_name) / "settings.json"
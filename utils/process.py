@@ -1,16 +1,86 @@
 import os
+import signal
 import subprocess
 
 
-def hidden_process_kwargs():
+def hidden_process_kwargs(new_group=False):
     if os.name != "nt":
-        return {}
+        return {"start_new_session": True} if new_group else {}
 
     startupinfo = subprocess.STARTUPINFO()
     startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
     startupinfo.wShowWindow = subprocess.SW_HIDE
 
+    creationflags = subprocess.CREATE_NO_WINDOW
+    if new_group:
+        creationflags |= subprocess.CREATE_NEW_PROCESS_GROUP
     return {
-        "creationflags": subprocess.CREATE_NO_WINDOW,
+        "creationflags": creationflags,
         "startupinfo": startupinfo,
     }
+
+
+PROCESS_SUSPEND_RESUME = 0x0800
+TERMINATE_GRACE_SECONDS = 0.5
+
+
+def _nt_suspend_call(name, pid):
+    import ctypes
+
+    kernel32 = ctypes.windll.kernel32
+    handle = kernel32.OpenProcess(PROCESS_SUSPEND_RESUME, False, pid)
+    if not handle:
+        return False
+    try:
+        return getattr(ctypes.windll.ntdll, name)(handle) == 0
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def suspend_process(pid):
+    if os.name == "nt":
+        return _nt_suspend_call("NtSuspendProcess", pid)
+    try:
+        os.kill(pid, signal.SIGSTOP)
+        return True
+    except OSError:
+        return False
+
+
+def resume_process(pid):
+    if os.name == "nt":
+        return _nt_suspend_call("NtResumeProcess", pid)
+    try:
+        os.kill(pid, signal.SIGCONT)
+        return True
+    except OSError:
+        return False
+
+
+def _signal_group(process, sig):
+    try:
+        if os.getpgid(process.pid) == process.pid:
+            os.killpg(process.pid, sig)
+        else:
+            os.kill(process.pid, sig)
+    except OSError:
+        pass
+
+
+def terminate_process(process, grace=TERMINATE_GRACE_SECONDS):
+    # Processes started with hidden_process_kwargs(new_group=True) lead their
+    # own group, so the whole group is signalled on POSIX.
+    if process.poll() is not None:
+        return process.returncode
+    if os.name == "nt":
+        process.terminate()
+    else:
+        _signal_group(process, signal.SIGTERM)
+    try:
+        return process.wait(timeout=grace)
+    except subprocess.TimeoutExpired:
+        if os.name == "nt":
+            process.kill()
+        else:
+            _signal_group(process, signal.SIGKILL)
+        return process.wait()